@@ -1,9 +1,11 @@
 # use decorator or field from AuditLog on models you want audited
-# by default, all requests to views are also logged (static file requests are not)
-# that can be changed in settings (see the options in default_settings.py)
+# requests are only logged as audit_request signals from AuditMiddleware (see auditlog.signals), sent when the
+# signal has receivers and REQUEST_LOGGING is on, and not inside disable_audit
+# the options are in default_settings.py
 #
-# at present, queryset.update, bulk_create, and any raw SQL operations are not logged
-# except if request and SQL logging is enabled, then all queries, including those, will be logged
+# queryset.update, bulk_create and queryset deletes are logged for models that use audit.AuditManager
+# (or audit.AuditQuerySet) as their manager, otherwise only deletes are.
+# at present, raw SQL operations are not logged
 
 from __future__ import absolute_import
 
@@ -1,20 +1,37 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
-import json
 from django.contrib import admin
-from django.contrib.admin.util import flatten_fieldsets
+try:
+    from django.contrib.admin.utils import flatten_fieldsets
+except ImportError:
+    # < django 1.7
+    from django.contrib.admin.util import flatten_fieldsets
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, PAGE_VAR
 from django import forms
-from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.html import escape
+from django.utils import six
 from django.utils.safestring import mark_safe
 
+from auditlog import encoding
+from auditlog.default_settings import settings as audit_settings
 from auditlog.models import ModelChange
+from auditlog.utils import get_content_type, get_user_ids
+
+
+# the changelist parameter holding the id the next page of a large table starts below
+BEFORE_VAR = 'before'
 
 
 class DictionaryDisplayWidget(forms.Widget):
     def render(self, name, value, attrs=None):
-        value = json.loads(value)
+        # ModelChange's fields decode the stored JSON themselves
+        if isinstance(value, six.string_types):
+            value = encoding.loads(value)
         if value:
             rows = []
             for key, val in value.items():
@@ -32,15 +49,156 @@ class AuditChangeAdminForm(forms.ModelForm):
 
     class Meta:
         model = ModelChange
-        fields = ('timestamp', 'user', 'remote_addr', 'remote_host',
+        # timestamp isn't editable, it's only a declared field
+        fields = ('user', 'remote_addr', 'remote_host',
                   'model_type', 'model_pk', 'action', 'pre_change_state', 'changes',)
 
 
+def estimate_count(queryset):
+    """ the planner's estimate of the number of rows in a queryset, None if the database can't tell """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, six.string_types):
+        plan = encoding.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """ counts exactly only when the estimated count is below the ADMIN_EXACT_COUNT_LIMIT setting """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < audit_settings.ADMIN_EXACT_COUNT_LIMIT:
+            self.estimated = False
+            return self.object_list.count()
+        self.estimated = True
+        return estimate
+
+
+class InputFilter(admin.ListFilter):
+    """ a text box rather than a list of choices, for filtering on values there are too many of to list """
+    template = 'admin/auditlog/input_filter.html'
+    parameter_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        super(InputFilter, self).__init__(request, params, model, model_admin)
+        if self.parameter_name in params:
+            self.used_parameters[self.parameter_name] = params.pop(self.parameter_name)
+
+    def value(self):
+        return self.used_parameters.get(self.parameter_name)
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def choices(self, cl):
+        yield {
+            'name': self.parameter_name,
+            'value': self.value() or '',
+            'hidden': [
+                (name, value) for name, value in cl.get_filters_params().items()
+                if name != self.parameter_name
+            ],
+            'clear_url': cl.get_query_string(remove=[self.parameter_name, BEFORE_VAR]),
+        }
+
+
+class UserInputFilter(InputFilter):
+    """ changes by a user, given their username or id """
+    title = 'user'
+    parameter_name = 'user'
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        return queryset.filter(user_id__in=get_user_ids(value))
+
+
+class ModelInputFilter(InputFilter):
+    """ changes to a model, given as app_label.model_name """
+    title = 'model'
+    parameter_name = 'model'
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        try:
+            content_type = get_content_type(value)
+        except ValueError:
+            raise IncorrectLookupParameters('Unknown model {}'.format(value))
+        return queryset.filter(model_type_id=content_type.pk)
+
+
+class AuditChangeList(ChangeList):
+    """ leaves the payloads out of the list, they're only shown on the change form """
+
+    def get_queryset(self, request):
+        queryset = super(AuditChangeList, self).get_queryset(request).defer('pre_change_state', 'changes')
+        if audit_settings.DATABASE:
+            # users and content types can't be joined from another database, they're loaded for the whole page
+            # with a query each instead
+            queryset = queryset.prefetch_related('model_type', 'user')
+        return queryset
+
+
+class KeysetChangeList(AuditChangeList):
+    """
+    pages through the newest changes first by id (?before=<id>) instead of with an offset, which stays
+    fast however deep into a large table it goes. Sorting by a column falls back to numbered pages
+    """
+    keyset = False
+
+    def get_filters_params(self, params=None):
+        lookup_params = super(KeysetChangeList, self).get_filters_params(params)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params:
+            return super(KeysetChangeList, self).get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        before = self.params.get(BEFORE_VAR)
+        if before:
+            try:
+                queryset = queryset.filter(pk__lt=int(before))
+            except ValueError:
+                raise IncorrectLookupParameters('Invalid {} value'.format(BEFORE_VAR))
+        rows = list(queryset[:self.list_per_page + 1])
+
+        self.keyset = True
+        self.result_count = paginator.count
+        self.count_estimated = getattr(paginator, 'estimated', False)
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows[:self.list_per_page]
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = paginator
+        self.newest_url = self.get_query_string(remove=[BEFORE_VAR, PAGE_VAR]) if before else None
+        self.older_url = None
+        if len(rows) > self.list_per_page:
+            self.older_url = self.get_query_string({BEFORE_VAR: self.result_list[-1].pk}, [PAGE_VAR])
+
+
 class ReadOnlyAdminMixin(object):
     # note: the dict display widget doesn't work if the field is readonly
-    def get_readonly_fields(self, *args, **kwargs):
-        if self.declared_fieldsets:
-            return flatten_fieldsets(self.declared_fieldsets)
+    def get_readonly_fields(self, request, obj=None):
+        if self.fieldsets:
+            return flatten_fieldsets(self.get_fieldsets(request, obj))
         else:
             return list(set(
                 [field.name for field in self.opts.local_fields] +
@@ -58,6 +216,7 @@ class AuditAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
     list_display = ('timestamp', 'action', 'model_type', 'model_pk', 'user', 'remote_addr', 'remote_host')
     list_filter = ('model_type', 'action', 'user',)
     ordering = ('-timestamp',)
+    change_list_template = 'admin/auditlog/change_list.html'
     date_hierarchy = 'timestamp'
     form = AuditChangeAdminForm
 
@@ -74,5 +233,32 @@ class AuditAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
         }),
     )
 
+    @property
+    def list_select_related(self):
+        # no joins to tables in another database when the audit log has a database of its own, see
+        # AuditChangeList
+        return () if audit_settings.DATABASE else ('model_type', 'user')
+
+    # see the ADMIN_LARGE_TABLE setting
+    large_table_list_filter = (ModelInputFilter, 'action', UserInputFilter)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList if audit_settings.ADMIN_LARGE_TABLE else AuditChangeList
+
+    def get_list_filter(self, request):
+        return self.large_table_list_filter if audit_settings.ADMIN_LARGE_TABLE else self.list_filter
+
+    def get_ordering(self, request):
+        # newest first either way, ids follow timestamps closely enough for browsing
+        return ('-pk',) if audit_settings.ADMIN_LARGE_TABLE else self.ordering
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        paginator_class = EstimatedCountPaginator if audit_settings.ADMIN_LARGE_TABLE else self.paginator
+        return paginator_class(queryset, per_page, orphans, allow_empty_first_page)
+
+    @property
+    def show_full_result_count(self):
+        return not audit_settings.ADMIN_LARGE_TABLE
+
 
 admin.site.register(ModelChange, AuditAdmin)
@@ -0,0 +1,66 @@
+"""
+Streaming ModelChange rows out of the database into compressed JSON lines files
+"""
+from __future__ import unicode_literals, absolute_import
+
+import gzip
+import json
+import os
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def iterate_in_chunks(queryset, chunk_size=2000):
+    """
+    yield the objects of a queryset in pk order, fetching chunk_size rows at a time by pk range
+    so memory stays constant however large the table is
+    """
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        for obj in chunk:
+            yield obj
+        last_pk = chunk[-1].pk
+
+
+def change_to_dict(change):
+    return {
+        'id': change.pk,
+        'timestamp': change.timestamp,
+        'action': change.action,
+        'model_type_id': change.model_type_id,
+        'model_pk': change.model_pk,
+        'user_id': change.user_id,
+        'remote_addr': change.remote_addr,
+        'remote_host': change.remote_host,
+        'pre_change_state': change.pre_change_state,
+        'changes': change.changes,
+        'compact': change.compact,
+        'chain_hash': change.chain_hash,
+    }
+
+
+def archive_changes(queryset, path, chunk_size=2000):
+    """
+    write the changes in a queryset to a gzipped JSON lines file, which is complete and synced to disk
+    when this returns. Returns the number of changes written and the largest pk among them.
+    """
+    count = 0
+    last_pk = None
+    temp_path = path + '.partial'
+    with open(temp_path, 'wb') as raw_file:
+        with gzip.GzipFile(fileobj=raw_file, mode='wb') as archive:
+            for change in iterate_in_chunks(queryset, chunk_size):
+                line = json.dumps(change_to_dict(change), cls=DjangoJSONEncoder, sort_keys=True) + '\n'
+                archive.write(line.encode('utf-8'))
+                count += 1
+                last_pk = change.pk
+        raw_file.flush()
+        os.fsync(raw_file.fileno())
+    # only a finished archive gets the real name
+    os.rename(temp_path, path)
+    return count, last_pk
@@ -1,17 +1,68 @@
 from __future__ import unicode_literals, absolute_import
 
+import random
+import threading
+from contextlib import contextmanager
+
 from django.contrib.contenttypes.models import ContentType
-from django.forms.models import model_to_dict
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.query import QuerySet
 
 from .default_settings import settings as audit_settings
-from .models import ModelChange
+from .context import is_audit_disabled, request_attribution
+from .extractor import FieldExtractor
+from .history import replay_changes
+from .models import M2M_ACTIONS, ModelChange
+from .sinks import get_sinks
 from . import signals
 
+try:
+    # django 1.9
+    from django.db.models.fields.related import lazy_related_operation
+except ImportError:
+    from django.db.models.fields.related import add_lazy_relation
+
+    def lazy_related_operation(function, model, related_model, **kwargs):
+        add_lazy_relation(model, None, related_model,
+                          lambda field, related, model: function(model, related, **kwargs))
+
 
 tracked_models = []
 
 
+class _BulkOperation(threading.local):
+    def __init__(self):
+        # ModelChange objects collected while a queryset delete is running, None otherwise
+        self.changes = None
+
+_bulk_operation = _BulkOperation()
+
+
+@contextmanager
+def collect_changes():
+    """ hold the changes written by the signal handlers so they can be written in one batch """
+    previous, _bulk_operation.changes = _bulk_operation.changes, []
+    try:
+        yield _bulk_operation.changes
+    finally:
+        _bulk_operation.changes = previous
+
+
+def clear_model_type_cache(**kwargs):
+    """ forget the content type ids of tracked models, they can change when the tables are recreated """
+    for model in tracked_models:
+        audit_log = getattr(model, audit_settings.AUDIT_META_NAME).audit_log
+        if audit_log is not None and audit_log.descriptor is not None:
+            audit_log.descriptor.clear_cache()
+
+models.signals.post_migrate.connect(clear_model_type_cache, dispatch_uid='auditlog.clear_model_type_cache')
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 # making this a descriptor that just stores a dict of instance -> meta mappings means
 # that it doesn't even need to be an attr anymore. But I haven't changed that.
 class AuditMeta(object):
@@ -19,7 +70,15 @@ class AuditMeta(object):
         def __init__(self, audit=True):
             self.additional_kwargs = {}
             self.pre_save = None
+            # pre_save as a tuple of the tracked field values, see FieldExtractor
+            self.pre_save_values = None
+            # pre_save only has the fields in the update_fields of the save
+            self.partial_pre_save = False
+            # (pk, field values) as loaded from the database, only kept when snapshot_on_load is enabled
+            self.snapshot = None
             self.audit = audit
+            # the instance's AuditLog.Manager, built on first access
+            self.manager = None
 
         def update_additional_kwargs(self, updates=None, **update_kwargs):
             if updates:
@@ -30,9 +89,12 @@ class AuditMeta(object):
         def reset(self):
             self.additional_kwargs = {}
             self.pre_save = None
+            self.pre_save_values = None
+            self.partial_pre_save = False
 
-    def __init__(self):
+    def __init__(self, audit_log=None):
         self.audit = True
+        self.audit_log = audit_log
 
     def __get__(self, instance, owner):
         if instance is None:
@@ -56,11 +118,12 @@ class AuditLog(object):
         def __init__(self, model_type, instance=None, **kwargs):
             super(AuditLog.Manager, self).__init__(**kwargs)
             self.model = ModelChange
-            self.model_type = model_type
+            # a ContentType or its id
+            self.model_type_id = getattr(model_type, 'pk', model_type)
             self.instance = instance
 
         def get_queryset(self):
-            base_queryset = super(AuditLog.Manager, self).get_queryset().filter(model_type=self.model_type)
+            base_queryset = super(AuditLog.Manager, self).get_queryset().filter(model_type_id=self.model_type_id)
             if not self.instance:
                 return base_queryset
             # TODO: have fallback or at least check that the model has an pk that is a positive integer
@@ -69,35 +132,237 @@ class AuditLog(object):
         def get_query_set(self):
             return self.get_queryset()
 
+        def as_of(self, timestamp, pks=None, cache=None):
+            """
+            the field values of the objects that existed at `timestamp`, as (pk, state) pairs in pk order,
+            rebuilt in a single pass over their changes. Only the instance for an instance's manager, or the
+            objects with the given pks. With a history.StateCache, replaying starts from a cached earlier
+            result when there is one, and the result is cached.
+            """
+            if self.instance is not None:
+                pks = [self.instance.pk]
+            if pks is not None:
+                pks = sorted(set(pks))
+
+            states = {}
+            queryset = self.get_queryset().filter(timestamp__lte=timestamp)
+            if cache is not None:
+                since, states = cache.get(self.model_type_id, timestamp, pks)
+                if since is not None:
+                    queryset = queryset.filter(timestamp__gt=since)
+            replayed = replay_changes(self.iterate_changes(queryset, pks), states)
+
+            if cache is None:
+                return ((pk, state) for pk, state in replayed if state is not None)
+            states = dict(states)
+            states.update(replayed)
+            states = dict((pk, state) for pk, state in states.items() if state is not None)
+            cache.set(self.model_type_id, timestamp, pks, states)
+            return iter(sorted(states.items()))
+
+        def iterate_changes(self, queryset, pks=None):
+            """ the changes in a queryset ordered by (model_pk, timestamp), for some model pks at a time """
+            ordering = ('model_pk', 'timestamp', 'pk')
+            if pks is None:
+                for change in queryset.order_by(*ordering).iterator():
+                    yield change
+                return
+            # keeps below the query parameter limits of some backends
+            batch_size = connections[queryset.db].ops.bulk_batch_size(['model_pk'], pks) or 1
+            for batch in _chunks(pks, batch_size):
+                for change in queryset.filter(model_pk__in=batch).order_by(*ordering).iterator():
+                    yield change
+
     class Descriptor(object):
         def __init__(self, model_class):
             self.model_class = model_class
+            self.model_type_id = None
+            self.manager = None
+
+        def get_model_type_id(self):
+            # looked up on first use rather than when the model is set up, the content type table may not
+            # be ready then. cleared after migrations (see clear_model_type_cache)
+            if self.model_type_id is None:
+                self.model_type_id = ContentType.objects.get_for_model(self.model_class).pk
+            return self.model_type_id
+
+        def clear_cache(self):
+            self.model_type_id = None
+            self.manager = None
 
         def __get__(self, instance, owner):
-            model_type = ContentType.objects.get_for_model(self.model_class)
             if instance is None:
-                return AuditLog.Manager(model_type)
-            return AuditLog.Manager(model_type, instance)
-
-    def __init__(self, exclude=None):
-        if not exclude:
-            self.exclude = exclude
-        else:
-            self.exclude = []
+                if self.manager is None:
+                    self.manager = AuditLog.Manager(self.get_model_type_id())
+                return self.manager
+
+            audit_meta = getattr(instance, audit_settings.AUDIT_META_NAME)
+            manager = audit_meta.manager
+            # a copied instance shares the meta of the original
+            if manager is None or manager.instance is not instance:
+                manager = audit_meta.manager = AuditLog.Manager(self.get_model_type_id(), instance)
+            return manager
+
+    def __init__(self, exclude=None, snapshot_on_load=None, fields=None, ignore_only_changes_to=None):
+        """
+        only the fields in `fields` (default: all) minus the ones in `exclude` are tracked. Updates that only
+        change fields in `ignore_only_changes_to` aren't logged, and neither are saves whose update_fields are
+        all ignored or untracked, which then skip reading the current row as well
+        """
+        self.exclude = list(exclude) if exclude else []
+        self.fields = list(fields) if fields is not None else None
+        self.ignore_only_changes_to = frozenset(ignore_only_changes_to or ())
+        if snapshot_on_load is None:
+            snapshot_on_load = audit_settings.SNAPSHOT_ON_LOAD
+        self.snapshot_on_load = snapshot_on_load
+        # model -> FieldExtractor
+        self._extractors = {}
+        # through model -> tracked many to many field
+        self._m2m_fields = {}
+        self.descriptor = None
 
     def contribute_to_class(self, cls, name):
         self.attr_name = name
         self.connect_signals(cls)
-        descriptor = AuditLog.Descriptor(cls)
-        setattr(cls, self.attr_name, descriptor)
-        setattr(cls, audit_settings.AUDIT_META_NAME, AuditMeta())
+        self.descriptor = AuditLog.Descriptor(cls)
+        setattr(cls, self.attr_name, self.descriptor)
+        setattr(cls, audit_settings.AUDIT_META_NAME, AuditMeta(self))
+        if self.snapshot_on_load:
+            self.hook_model_loading(cls)
+        # the field list is only complete once the class is, see also decorate
+        models.signals.class_prepared.connect(self.class_prepared_handler, sender=cls, weak=False)
         tracked_models.append(cls)
 
+    def class_prepared_handler(self, sender, **kwargs):
+        self.get_extractor(sender)
+
     def connect_signals(self, cls):
         models.signals.post_save.connect(self.post_save_handler, sender=cls, weak=False)
         models.signals.post_delete.connect(self.post_delete_handler, sender=cls, weak=False)
         models.signals.pre_save.connect(self.pre_save_handler, sender=cls, weak=False)
         models.signals.pre_delete.connect(self.pre_save_handler, sender=cls, weak=False)
+        # m2m_changed is connected for each relation's through model once the fields are known, see get_extractor
+
+    def connect_m2m_field(self, model, through, field):
+        self._m2m_fields[through] = field
+        models.signals.m2m_changed.connect(self.m2m_changed_handler, sender=through, weak=False)
+
+    def hook_model_loading(self, cls):
+        """
+        wraps from_db and refresh_from_db so instances remember the field values they were loaded with,
+        which lets pre_save_handler skip the select of the current row
+        """
+        if not hasattr(cls, 'from_db'):
+            # < django 1.8 has no loading hook, the select is always used
+            return
+        audit_log = self
+        base_from_db = cls.from_db.__func__
+        base_refresh_from_db = cls.refresh_from_db
+
+        def from_db(klass, db, field_names, values):
+            instance = base_from_db(klass, db, field_names, values)
+            audit_log.take_snapshot(instance)
+            return instance
+
+        def refresh_from_db(instance, using=None, fields=None, **kwargs):
+            base_refresh_from_db(instance, using=using, fields=fields, **kwargs)
+            if fields is None:
+                audit_log.take_snapshot(instance)
+            else:
+                # other attributes may hold unsaved values, so a partial refresh can't be trusted
+                getattr(instance, audit_settings.AUDIT_META_NAME).snapshot = None
+
+        cls.from_db = classmethod(from_db)
+        cls.refresh_from_db = refresh_from_db
+
+    def get_extractor(self, model):
+        extractor = self._extractors.get(model)
+        if extractor is None:
+            extractor = self._extractors[model] = FieldExtractor(model, self.exclude, self.fields)
+            for field in extractor.m2m_fields:
+                # explicit through models may not be loaded yet
+                through = (getattr(field, 'remote_field', None) or field.rel).through
+                lazy_related_operation(self.connect_m2m_field, model, through, field=field)
+        return extractor
+
+    def only_ignored_changes(self, field_names):
+        """ whether changes to (at most) these fields go unlogged, see ignore_only_changes_to """
+        return bool(self.ignore_only_changes_to) and self.ignore_only_changes_to.issuperset(field_names)
+
+    def skips_update_fields(self, model, update_fields):
+        """ whether a save with update_fields can't change anything that would be logged """
+        if update_fields is None:
+            return False
+        names = self.get_extractor(model).tracked_names(update_fields)
+        return not names or self.only_ignored_changes(names)
+
+    def get_snapshot_fields(self, model):
+        """ (name, attname) pairs for the tracked concrete fields """
+        return self.get_extractor(model).fields
+
+    def take_snapshot(self, instance, update_fields=None):
+        audit_meta = getattr(instance, audit_settings.AUDIT_META_NAME)
+        extractor = self.get_extractor(instance.__class__)
+        fields = extractor.fields
+        if any(attname not in instance.__dict__ for attname in extractor.attnames):
+            # deferred fields, the snapshot would be incomplete
+            audit_meta.snapshot = None
+            return
+
+        values = extractor.copied_values(instance)
+        if update_fields is not None:
+            if audit_meta.snapshot is None:
+                return
+            # only the listed fields were written, the rest of the row still holds the old values
+            values = tuple(
+                value if name in update_fields or attname in update_fields else old_value
+                for (name, attname), value, old_value in zip(fields, values, audit_meta.snapshot[1])
+            )
+        audit_meta.snapshot = (instance.pk, values)
+
+    def get_instance_state(self, instance):
+        """ the tracked concrete field values of an instance, without touching the database """
+        extractor = self.get_extractor(instance.__class__)
+        return extractor.to_dict(extractor.values(instance))
+
+    def get_bulk_states(self, queryset, field_names=None):
+        """ pk -> tracked field values for every row in the queryset, in a single query """
+        if field_names is None:
+            field_names = [name for name, _ in self.get_snapshot_fields(queryset.model)]
+        return dict(
+            (row[0], dict(zip(field_names, row[1:])))
+            for row in queryset.values_list('pk', *field_names)
+        )
+
+    def get_pre_save_state(self, sender, instance, audit_meta, update_fields=None):
+        """
+        (tracked field values, state dict) of the row an instance is about to overwrite. Without a snapshot
+        and with update_fields, only those columns are read and the values are None
+        """
+        extractor = self.get_extractor(sender)
+        snapshot = audit_meta.snapshot
+        if snapshot is not None and snapshot[0] == instance.pk:
+            return snapshot[1], extractor.to_dict(snapshot[1])
+
+        queryset = sender._base_manager.using(instance._state.db)
+        names = extractor.tracked_names(update_fields) if update_fields is not None else None
+        if names is not None:
+            queryset = queryset.only(*names)
+        try:
+            current = queryset.get(pk=instance.pk)
+        except sender.DoesNotExist:
+            # this shouldn't happen unless the user manually assigns something to the pk before saving
+            # TODO: log this somehow
+            return None, None
+        if names is not None:
+            return None, extractor.partial_state(current, names)
+        values = extractor.values(current)
+        return values, extractor.to_dict(values)
+
+    def get_model_type_id(self, model):
+        if self.descriptor is not None and self.descriptor.model_class is model:
+            return self.descriptor.get_model_type_id()
+        return ContentType.objects.get_for_model(model).pk
 
     def build_kwargs_from_instance(self, instance):
         kwargs = {}
@@ -110,77 +375,279 @@ class AuditLog(object):
 
     # also handles pre_delete
     def pre_save_handler(self, sender, instance, **kwargs):
-        if kwargs.get('raw', False) or not self.should_log_change(sender, instance):
+        if kwargs.get('signal') is models.signals.pre_delete:
+            action = 'DELETE'
+        else:
+            action = 'CREATE' if instance._state.adding else 'UPDATE'
+        if kwargs.get('raw', False) or not self.should_log_change(sender, instance, action):
+            return
+        if action == 'UPDATE' and self.skips_update_fields(sender, kwargs.get('update_fields')):
             return
         audit_meta = getattr(instance, audit_settings.AUDIT_META_NAME)
 
+        self.attribute_change(audit_meta)
         signals.audit_presave.send(sender=self.__class__, model_instance=instance, audit_meta=audit_meta)
 
         if instance.pk is not None:
-            try:
-                audit_meta.pre_save = model_to_dict(sender.objects.get(pk=instance.pk), exclude=self.exclude)
-            except sender.DoesNotExist:
-                # this shouldn't happen unless the user manually assigns something to the pk before saving
-                # TODO: log this somehow
-                pass
+            if _bulk_operation.changes is not None and kwargs.get('signal') is models.signals.pre_delete:
+                # instances deleted by a queryset were just loaded by the deletion collector
+                audit_meta.pre_save = self.get_instance_state(instance)
+            else:
+                update_fields = kwargs.get('update_fields')
+                audit_meta.pre_save_values, audit_meta.pre_save = self.get_pre_save_state(
+                    sender, instance, audit_meta, update_fields)
+                audit_meta.partial_pre_save = (update_fields is not None and audit_meta.pre_save is not None and
+                                               audit_meta.pre_save_values is None)
         audit_meta.update_additional_kwargs(self.build_kwargs_from_instance(instance))
 
     def post_save_handler(self, sender, instance, created, **kwargs):
         meta = getattr(instance, audit_settings.AUDIT_META_NAME)
-        if kwargs.get('raw', False) or not self.should_log_change(sender, instance):
-            return
+        if self.snapshot_on_load and not kwargs.get('raw', False):
+            # refresh even when not logging, a stale snapshot would produce wrong diffs later on
+            self.take_snapshot(instance, update_fields=kwargs.get('update_fields'))
         action = 'CREATE' if created else 'UPDATE'
-        self.create_change_object(instance, action)
+        if kwargs.get('raw', False) or not self.should_log_change(sender, instance, action):
+            return
+        if action == 'UPDATE' and self.skips_update_fields(sender, kwargs.get('update_fields')):
+            return
+        self.create_change_object(instance, action, update_fields=kwargs.get('update_fields'))
         meta.reset()
 
     def post_delete_handler(self, sender, instance, **kwargs):
         meta = getattr(instance, audit_settings.AUDIT_META_NAME)
-        if kwargs.get('raw', False) or not self.should_log_change(sender, instance):
+        meta.snapshot = None
+        if kwargs.get('raw', False) or not self.should_log_change(sender, instance, 'DELETE'):
             return
         self.create_change_object(instance, 'DELETE')
         meta.reset()
 
-    def create_change_object(self, instance, action):
+    def get_m2m_field(self, through):
+        return self._m2m_fields.get(through)
+
+    def m2m_changed_handler(self, sender, instance, action, reverse, model, pk_set, using, **kwargs):
+        """
+        logs one LINK or UNLINK change for each tracked object whose relation was changed, with the pks
+        that were added or removed. Clearing a relation takes a query for the pks it removes
+        """
+        if action not in ('post_add', 'post_remove', 'pre_clear'):
+            return
+        field = self.get_m2m_field(sender)
+        if field is None:
+            return
+        tracked_model = model if reverse else instance.__class__
+        audit_action = 'LINK' if action == 'post_add' else 'UNLINK'
+        if not self.should_log_change(tracked_model, None if reverse else instance, audit_action):
+            return
+
+        if action == 'pre_clear':
+            # the source and target columns of the through table, as seen from instance
+            source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+            if reverse:
+                source, target = target, source
+            pk_set = sender._base_manager.using(using).filter(**{source: instance.pk}).values_list(
+                target, flat=True)
+        pks = sorted(pk_set or ())
+        if not pks:
+            return
+        if reverse:
+            changes = [(pk, None, {field.name: [instance.pk]}) for pk in pks]
+        else:
+            changes = [(instance.pk, None, {field.name: pks})]
+        self.create_bulk_change_objects(tracked_model, audit_action, changes, using=using)
+
+    def create_change_object(self, instance, action, update_fields=None):
         audit_meta = getattr(instance, audit_settings.AUDIT_META_NAME)
+        extractor = self.get_extractor(instance.__class__)
         changes = {}
-        if action == 'UPDATE' and audit_meta.pre_save:
-            for field_name, new_value in model_to_dict(instance, exclude=self.exclude).items():
-                old_value = audit_meta.pre_save.get(field_name)
-                if old_value != new_value:
+        if action == 'UPDATE' and audit_meta.pre_save and update_fields is not None:
+            # only these were written, other attributes may have unsaved values
+            for field_name, new_value in extractor.partial_state(
+                    instance, extractor.tracked_names(update_fields)).items():
+                if audit_meta.pre_save.get(field_name) != new_value:
                     changes[field_name] = new_value
+        elif action == 'UPDATE' and audit_meta.pre_save:
+            if audit_meta.pre_save_values is not None:
+                changes = extractor.diff(audit_meta.pre_save_values, extractor.values(instance))
+            else:
+                for field_name, new_value in extractor.state(instance).items():
+                    if audit_meta.pre_save.get(field_name) != new_value:
+                        changes[field_name] = new_value
         elif action != 'DELETE':
-            changes = model_to_dict(instance, exclude=self.exclude)
+            changes = extractor.state(instance)
 
+        if action == 'UPDATE' and self.only_ignored_changes(changes):
+            changes = {}
         if changes or action == 'DELETE':
+            pre_change_state, compact = audit_meta.pre_save, False
+            if action == 'UPDATE' and audit_meta.partial_pre_save:
+                # only the saved fields were read, which is stored like a compact change
+                pre_change_state, compact = dict(
+                    (field_name, pre_change_state.get(field_name)) for field_name in changes), True
+            elif action == 'UPDATE':
+                pre_change_state, compact = self.compact_state(pre_change_state, changes)
             creation_kwargs = {
-                'model': instance,
+                'model_type_id': self.get_model_type_id(instance.__class__),
+                'model_pk': instance.pk,
                 'action': action,
-                'pre_change_state': audit_meta.pre_save,
+                'pre_change_state': pre_change_state,
                 'changes': changes,
+                'compact': compact,
             }
 
-            request = audit_meta.additional_kwargs.get('request')
-            if request and not audit_meta.additional_kwargs.get('user'):
-                audit_meta.additional_kwargs['user'] = request.user
+            creation_kwargs.update(self.get_additional_kwargs(audit_meta))
+            self.write_changes([ModelChange(**creation_kwargs)], using=instance._state.db)
 
-            creation_kwargs.update(audit_meta.additional_kwargs)
-            ModelChange.objects.create(**creation_kwargs)
+    def compact_state(self, pre_change_state, changes):
+        """
+        the pre_change_state to store for an update and whether it is compact, with COMPACT_STORAGE only
+        the old values of the changed fields are kept, except on about one in CHECKPOINT_INTERVAL updates
+        """
+        if not audit_settings.COMPACT_STORAGE or pre_change_state is None:
+            return pre_change_state, False
+        interval = audit_settings.CHECKPOINT_INTERVAL
+        # picked at random rather than counted, counting would need a query for every update
+        if interval and random.randrange(interval) == 0:
+            return pre_change_state, False
+        return dict((field_name, pre_change_state.get(field_name)) for field_name in changes), True
+
+    def attribute_change(self, audit_meta):
+        # from the request being handled (see auditlog.context), audit_presave receivers can override it
+        attribution = request_attribution.get()
+        if attribution and audit_meta.audit:
+            audit_meta.update_additional_kwargs(attribution)
+
+    def get_additional_kwargs(self, audit_meta):
+        request = audit_meta.additional_kwargs.get('request')
+        if request and not audit_meta.additional_kwargs.get('user'):
+            audit_meta.additional_kwargs['user'] = request.user
+        return audit_meta.additional_kwargs
+
+    def create_bulk_change_objects(self, model, action, changes, using=None):
+        """
+        log changes made by a queryset operation on `model`, `changes` is a list of
+        (pk, pre_change_state, changes) tuples
+        """
+        # one signal for the whole operation, there is no single instance to pass along
+        audit_meta = AuditMeta.InstanceMeta()
+        self.attribute_change(audit_meta)
+        signals.audit_presave.send(sender=self.__class__, model_instance=None, audit_meta=audit_meta)
+        additional_kwargs = self.get_additional_kwargs(audit_meta)
+
+        model_type_id = self.get_model_type_id(model)
+        change_objects = []
+        for pk, pre_change_state, changed in changes:
+            compact = action in M2M_ACTIONS
+            if action == 'UPDATE':
+                pre_change_state, compact = self.compact_state(pre_change_state, changed)
+            change_objects.append(ModelChange(
+                model_type_id=model_type_id, model_pk=pk, action=action, pre_change_state=pre_change_state,
+                changes=changed, compact=compact, **additional_kwargs))
+        self.write_changes(change_objects, using=using)
+
+    def write_changes(self, changes, using=None):
+        """ hand ModelChange objects for instances in the database `using` to the sinks (see auditlog.sinks) """
+        if _bulk_operation.changes is not None:
+            _bulk_operation.changes.extend(changes)
+            return
+        for sink in get_sinks(first=True):
+            sink.write(changes, using=using)
 
-    def should_log_change(self, sender, instance):
-        # hook to do more, eventually
-        return audit_settings.CHANGE_LOGGING
+    def should_log_change(self, sender, instance, action=None):
+        return audit_settings.CHANGE_LOGGING and not is_audit_disabled(sender, action)
 
     @classmethod
-    def decorate(cls, field_name='audit_log', exclude=None):
+    def decorate(cls, field_name='audit_log', exclude=None, snapshot_on_load=None, fields=None,
+                 ignore_only_changes_to=None):
         """allows use as a model class decorator instead of adding as a field"""
 
         def add_field(klass):
-            if exclude is None:
-                audit_log = cls([])
-            else:
-                audit_log = cls(exclude)
+            audit_log = cls(exclude, snapshot_on_load=snapshot_on_load, fields=fields,
+                            ignore_only_changes_to=ignore_only_changes_to)
 
             audit_log.contribute_to_class(klass, field_name)
+            # the class is complete already, class_prepared won't be sent again
+            audit_log.get_extractor(klass)
             return klass
 
         return add_field
+
+
+class AuditQuerySet(QuerySet):
+    """
+    queryset for models with an AuditLog that also logs update, bulk_create and delete. Each of them
+    reads the affected rows once and writes all of the resulting ModelChange objects together.
+
+    Only concrete fields are included in the logged state. bulk_create can only log objects that have
+    a pk afterwards, which depends on the database backend unless the pks are set beforehand.
+    """
+    def get_audit_log(self, action):
+        audit_meta = getattr(self.model, audit_settings.AUDIT_META_NAME, None)
+        audit_log = getattr(audit_meta, 'audit_log', None)
+        if audit_log is not None and audit_log.should_log_change(self.model, None, action):
+            return audit_log
+        return None
+
+    def update(self, **kwargs):
+        audit_log = self.get_audit_log('UPDATE')
+        if audit_log is None:
+            return super(AuditQuerySet, self).update(**kwargs)
+        assert self.query.can_filter(), "Cannot update a query once a slice has been taken."
+
+        field_names = list(audit_log.get_extractor(self.model).tracked_names(
+            self.model._meta.get_field(key).name for key in kwargs))
+        if not field_names or audit_log.only_ignored_changes(field_names):
+            return super(AuditQuerySet, self).update(**kwargs)
+        base_queryset = self.model._base_manager.using(self.db)
+        connection = connections[self.db]
+        rows = 0
+        with transaction.atomic(using=self.db, savepoint=False):
+            pre_change_states = audit_log.get_bulk_states(self.select_for_update())
+            pks = list(pre_change_states)
+            post_change_states = {}
+            # update exactly the rows that were read, the values are read back as the update may use expressions
+            for chunk in _chunks(pks, connection.ops.bulk_batch_size(['pk'], pks) or 1):
+                rows += base_queryset.filter(pk__in=chunk).update(**kwargs)
+                post_change_states.update(audit_log.get_bulk_states(base_queryset.filter(pk__in=chunk), field_names))
+
+            changes = []
+            for pk, post_change_state in post_change_states.items():
+                pre_change_state = pre_change_states[pk]
+                changed = dict((name, value) for name, value in post_change_state.items()
+                               if pre_change_state.get(name) != value)
+                if changed and not audit_log.only_ignored_changes(changed):
+                    changes.append((pk, pre_change_state, changed))
+            audit_log.create_bulk_change_objects(self.model, 'UPDATE', changes, using=self.db)
+        return rows
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        audit_log = self.get_audit_log('CREATE')
+        objs = super(AuditQuerySet, self).bulk_create(objs, *args, **kwargs)
+        if audit_log is not None:
+            audit_log.create_bulk_change_objects(self.model, 'CREATE', [
+                (obj.pk, None, audit_log.get_instance_state(obj)) for obj in objs if obj.pk is not None
+            ], using=self.db)
+        return objs
+
+    def delete(self):
+        audit_log = self.get_audit_log('DELETE')
+        if audit_log is None:
+            return super(AuditQuerySet, self).delete()
+        with transaction.atomic(using=self.db, savepoint=False):
+            # the deletion collector loads and signals each instance, including cascades, the handlers
+            # take the state from those instances and the changes are gathered here
+            with collect_changes() as changes:
+                result = super(AuditQuerySet, self).delete()
+            audit_log.write_changes(changes, using=self.db)
+        return result
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class AuditManager(models.Manager):
+    """ use as the manager of a model with an AuditLog to log queryset updates, bulk creates and deletes """
+    def get_queryset(self):
+        return AuditQuerySet(self.model, using=self._db)
+
+    def get_query_set(self):
+        return self.get_queryset()
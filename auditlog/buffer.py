@@ -0,0 +1,128 @@
+"""
+Buffering for ModelChange rows, used when the WRITE_MODE setting is 'buffered'
+
+Inside a transaction, changes are held until it commits and then written with a single bulk_create,
+changes made in a transaction (or savepoint) that is rolled back are dropped along with it. This needs
+transaction.on_commit (django 1.9+), older versions write changes made in a transaction immediately.
+
+Outside of a transaction changes are held until the end of the request if AuditMiddleware is installed,
+or written immediately otherwise. Any batch is written as soon as it reaches BUFFER_SIZE.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import threading
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+from .default_settings import settings as audit_settings
+from .chain import link_changes
+from .models import FieldChange, ModelChange
+
+
+def _insert(changes, using):
+    if len(changes) == 1:
+        changes[0].save(using=using)
+    else:
+        ModelChange.objects.using(using).bulk_create(changes)
+
+
+def write_changes(changes, using=None, with_pks=False):
+    """
+    save unsaved ModelChange objects with as few queries as possible, to the database `using` or the one
+    the routers pick. with_pks makes sure the objects have their pks afterwards
+    """
+    if not changes:
+        return
+    using = using or router.db_for_write(ModelChange)
+    if not audit_settings.INDEX_CHANGED_FIELDS and not audit_settings.HASH_CHAIN and not with_pks:
+        _insert(changes, using)
+        return
+
+    with transaction.atomic(using=using, savepoint=False):
+        if audit_settings.HASH_CHAIN:
+            # locks the heads of the chains until the transaction ends, the changes get the next pks
+            link_changes(changes, using)
+        if not audit_settings.INDEX_CHANGED_FIELDS and not with_pks:
+            _insert(changes, using)
+            return
+        if len(changes) > 1 and getattr(connections[using].features, 'can_return_ids_from_bulk_insert', False):
+            ModelChange.objects.using(using).bulk_create(changes)
+        else:
+            # bulk_create only sets the pks on some backends (django 1.10+)
+            for change in changes:
+                change.save(using=using)
+        if audit_settings.INDEX_CHANGED_FIELDS:
+            FieldChange.objects.using(using).bulk_create([
+                field_change for change in changes for field_change in change.get_field_changes()
+            ])
+
+
+class _TransactionBatch(object):
+    def __init__(self, hooks, sink):
+        # the connection's list of on_commit hooks at the time the batch was registered. django replaces
+        # the list whenever a transaction or savepoint ends, so this tells if the batch is still pending
+        self.hooks = hooks
+        # the DatabaseSink that saves the changes
+        self.sink = sink
+        self.changes = []
+
+
+class ChangeBuffer(threading.local):
+    def __init__(self):
+        # (db alias, savepoint ids, sink) -> _TransactionBatch
+        self.transaction_batches = {}
+        # sink -> changes
+        self.request_changes = None
+
+    def add(self, changes, sink, using=None):
+        """
+        buffer ModelChange objects for changes made to instances in the database `using`, which is the
+        connection whose transaction decides when (and if) they are written, until they are saved with
+        sink.save (see auditlog.sinks.DatabaseSink)
+        """
+        connection = connections[using or DEFAULT_DB_ALIAS]
+        if connection.in_atomic_block and hasattr(transaction, 'on_commit'):
+            buffered = self.get_transaction_batch(connection, sink).changes
+        elif connection.in_atomic_block or self.request_changes is None:
+            sink.save(changes, using=using)
+            return
+        else:
+            buffered = self.request_changes.setdefault(sink, [])
+
+        buffered.extend(changes)
+        if len(buffered) >= audit_settings.BUFFER_SIZE:
+            # inside a transaction this still rolls back along with it
+            sink.save(list(buffered), using=using)
+            del buffered[:]
+
+    def get_transaction_batch(self, connection, sink):
+        # atomic blocks without a savepoint have a sid of None, they can only be rolled back together
+        # with their enclosing block so they share its batch
+        key = (connection.alias, tuple(sid for sid in connection.savepoint_ids if sid is not None), sink)
+        batch = self.transaction_batches.get(key)
+        if batch is None or batch.hooks is not connection.run_on_commit:
+            # forget batches from transactions that have been rolled back
+            self.transaction_batches = dict(
+                (batch_key, pending) for batch_key, pending in self.transaction_batches.items()
+                if pending.hooks is connections[batch_key[0]].run_on_commit
+            )
+            batch = self.transaction_batches[key] = _TransactionBatch(connection.run_on_commit, sink)
+            transaction.on_commit(lambda: self.flush_transaction_batch(key, batch), using=connection.alias)
+        return batch
+
+    def flush_transaction_batch(self, key, batch):
+        if self.transaction_batches.get(key) is batch:
+            del self.transaction_batches[key]
+        batch.sink.save(batch.changes)
+
+    def begin_request(self):
+        # anything left over from a request that wasn't ended properly was still committed
+        self.end_request()
+        self.request_changes = {}
+
+    def end_request(self):
+        request_changes, self.request_changes = self.request_changes, None
+        for sink, changes in (request_changes or {}).items():
+            sink.save(changes)
+
+
+change_buffer = ChangeBuffer()
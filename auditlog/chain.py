@@ -0,0 +1,141 @@
+"""
+Tamper evident hash chains of ModelChange rows, used when the HASH_CHAIN setting is on
+
+Each change stores a SHA-256 hash of its contents and the hash of the change before it. There is a chain for
+each model type, so writers of different models don't wait on each other, and the rows of a chain are in
+pk order. HashChainHead holds the newest hash of every chain, its row is locked (where the database
+supports select_for_update) while a batch of changes is linked and inserted, until the transaction ends.
+
+HashChainHead also holds where the chain starts: it has the changes with a pk above start_pk, the first of
+them following start_hash. A chain starts after the changes to the model type written before it was set up,
+auditlog_retention moves the start on past the changes it removes.
+
+verify_chain (and the auditlog_verify command) recompute the hashes from the start. Changing, removing or
+inserting a row breaks the chain at that point, rows without a hash after the start are reported as well.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import hashlib
+import json
+from collections import namedtuple
+from django.db.models import Max
+from django.utils import timezone
+
+from . import encoding
+from .fields import EncodedJSON, decode
+from .models import HashChainHead, ModelChange
+
+
+# the ModelChange fields that are hashed, in this order
+HASHED_FIELDS = ('model_type_id', 'model_pk', 'action', 'timestamp', 'user_id', 'remote_addr', 'remote_host',
+                 'compact', 'pre_change_state', 'changes')
+
+ChainResult = namedtuple('ChainResult', ['model_type_id', 'checked', 'broken', 'head_found'])
+
+
+def canonical_timestamp(value):
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.utc)
+    return value.isoformat()
+
+
+def hash_values(previous, values):
+    """ the hash of a change with the values of HASHED_FIELDS, payloads decoded, following the hash `previous` """
+    values = list(values)
+    values[3] = canonical_timestamp(values[3])
+    # some backends read booleans back as integers
+    values[7] = bool(values[7])
+    record = json.dumps(values, sort_keys=True, separators=(',', ':'), default=encoding.default)
+    return hashlib.sha256((previous + '\n' + record).encode('utf-8')).hexdigest()
+
+
+def stored_values(change):
+    """ the hashed values of an unsaved change as they will read back from the database """
+    values = [getattr(change, name) for name in HASHED_FIELDS]
+    for index in (8, 9):
+        if values[index] is not None:
+            values[index] = encoding.loads(encoding.dumps(values[index]))
+    return values
+
+
+def link_changes(changes, using):
+    """
+    set the chain_hash of unsaved changes, which have to be inserted in this order in the transaction
+    that is open on `using`
+    """
+    by_model_type = {}
+    for change in changes:
+        by_model_type.setdefault(change.model_type_id, []).append(change)
+    # always locked in the same order, so concurrent batches can't deadlock
+    for model_type_id in sorted(by_model_type):
+        head, created = HashChainHead.objects.using(using).select_for_update().get_or_create(
+            model_type_id=model_type_id, defaults={'hash': ''})
+        if created:
+            # changes written before the chain was set up aren't part of it
+            head.start_pk = ModelChange.objects.using(using).filter(
+                model_type_id=model_type_id).aggregate(pk=Max('pk'))['pk']
+            head.save(using=using, update_fields=['start_pk'])
+        previous = head.hash
+        for change in by_model_type[model_type_id]:
+            change.chain_hash = previous = hash_values(previous, stored_values(change))
+        head.hash = previous
+        head.save(using=using, update_fields=['hash'])
+
+
+def move_chain_starts(queryset, using=None):
+    """ start the chains after the changes in `queryset`, before they are removed """
+    for head in HashChainHead.objects.using(using).select_for_update().filter(
+            model_type_id__in=queryset.order_by().values('model_type_id')):
+        last = queryset.filter(model_type_id=head.model_type_id).order_by('-pk').values_list(
+            'pk', 'chain_hash').first()
+        if last is not None and (head.start_pk is None or last[0] > head.start_pk):
+            # changes from before the chain have no hash, the chain still starts from start_hash
+            head.start_pk, head.start_hash = last[0], last[1] or head.start_hash
+            head.save(using=using, update_fields=['start_pk', 'start_hash'])
+
+
+def verify_chain(model_type_id, using=None, batch_size=2000, max_broken=100):
+    """
+    check the chain of a model type from its start, reading batch_size rows at a time. Returns a ChainResult
+    with the number of rows checked, the pks of (at most max_broken) rows that don't match their hash or
+    have none and whether the chain ends with the hash in HashChainHead, which it doesn't if the newest rows
+    were removed
+    """
+    head = HashChainHead.objects.using(using).filter(model_type_id=model_type_id).values_list(
+        'hash', 'start_pk', 'start_hash').first()
+    rows = ModelChange.objects.using(using).filter(model_type_id=model_type_id).order_by('pk')
+    if head is None:
+        # nothing tells where the chain starts, the rows with a hash are checked from the beginning
+        rows = rows.filter(chain_hash__isnull=False)
+        head_hash, previous = None, ''
+    else:
+        head_hash, start_pk, previous = head
+        if start_pk is not None:
+            rows = rows.filter(pk__gt=start_pk)
+    last_pk = None
+    checked = 0
+    broken = []
+    while True:
+        batch = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        batch = list(batch.values_list('pk', 'chain_hash', *HASHED_FIELDS)[:batch_size])
+        if not batch:
+            break
+        for row in batch:
+            chain_hash = row[1]
+            if chain_hash is None:
+                # inserted without going through the chain
+                if len(broken) < max_broken:
+                    broken.append(row[0])
+                continue
+            values = list(row[2:])
+            for index in (8, 9):
+                if isinstance(values[index], EncodedJSON):
+                    values[index] = decode(values[index])
+            if hash_values(previous, values) != chain_hash and len(broken) < max_broken:
+                broken.append(row[0])
+            # carry on from the stored hash, so one changed row doesn't fail all the ones after it
+            previous = chain_hash
+        checked += len(batch)
+        last_pk = batch[-1][0]
+    head_found = not checked if head is None else previous == head_hash
+    return ChainResult(model_type_id, checked, broken, head_found)
@@ -0,0 +1,71 @@
+"""
+Compression of large ModelChange payloads, see the COMPRESSION setting
+
+Compressed payloads are stored as text, a marker naming the method and format version followed by the
+base64 of the compressed JSON. JSON text can't start with a marker, so both kinds can be told apart.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import base64
+import zlib
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six
+
+from .default_settings import settings as audit_settings
+
+try:
+    import lzma
+except ImportError:
+    # python 2
+    lzma = None
+
+
+MARKERS = {
+    'zlib': 'z1:',
+    'lzma': 'x1:',
+}
+_METHODS = dict((marker, method) for method, marker in MARKERS.items())
+_MARKER_LENGTH = 3
+
+
+def _compressor(method):
+    if method == 'zlib':
+        return zlib.compress
+    if method == 'lzma' and lzma is not None:
+        return lzma.compress
+    raise ImproperlyConfigured('Unsupported audit log compression: {}'.format(method))
+
+
+def is_compressed(value):
+    return isinstance(value, six.string_types) and value[:_MARKER_LENGTH] in _METHODS
+
+
+def compress(text, method='zlib'):
+    data = _compressor(method)(text.encode('utf-8'))
+    return MARKERS[method] + base64.b64encode(data).decode('ascii')
+
+
+def decompress(text):
+    method = _METHODS[text[:_MARKER_LENGTH]]
+    data = base64.b64decode(text[_MARKER_LENGTH:].encode('ascii'))
+    if method == 'zlib':
+        return zlib.decompress(data).decode('utf-8')
+    if lzma is None:
+        raise ImproperlyConfigured('Payload compressed with lzma, which is not available')
+    return lzma.decompress(data).decode('utf-8')
+
+
+def to_json(text):
+    """ the JSON text of a stored payload """
+    return decompress(text) if is_compressed(text) else text
+
+
+def to_stored(json_text):
+    """ the text to store for a payload's JSON text, compressed if it's large enough """
+    method = audit_settings.COMPRESSION
+    if method and len(json_text) >= audit_settings.COMPRESSION_THRESHOLD:
+        compressed = compress(json_text, method)
+        # small gains aren't worth decompressing for
+        if len(compressed) < len(json_text):
+            return compressed
+    return json_text
@@ -0,0 +1,89 @@
+"""
+State local to the code running now, like the request changes are attributed to and whether audit
+logging is disabled
+
+Uses contextvars when available (python 3.7+) so the state follows asyncio tasks, otherwise it is local
+to the thread (or greenlet, when threads are monkey patched).
+"""
+from __future__ import unicode_literals, absolute_import
+
+import threading
+from contextlib import contextmanager
+from django.contrib.auth import get_user_model
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+
+class ContextLocal(object):
+    """ a value for the current context, set() returns a token that reset() takes to restore the previous one """
+    def __init__(self, name, default=None):
+        self.default = default
+        if contextvars is not None:
+            self.var = contextvars.ContextVar(name, default=default)
+        else:
+            self.var = None
+            self.local = threading.local()
+
+    def get(self):
+        if self.var is not None:
+            return self.var.get()
+        return getattr(self.local, 'value', self.default)
+
+    def set(self, value):
+        if self.var is not None:
+            return self.var.set(value)
+        previous = self.get()
+        self.local.value = value
+        return previous
+
+    def reset(self, token):
+        if self.var is None:
+            self.local.value = token
+            return
+        try:
+            self.var.reset(token)
+        except (ValueError, RuntimeError):
+            # the token is from another context or was used already, the value can't leak out of here then
+            self.var.set(self.default)
+
+
+# ModelChange fields (user, remote_addr, remote_host) for changes made now
+request_attribution = ContextLocal('auditlog_request_attribution')
+
+
+def get_request_attribution(request, user=None):
+    """ ModelChange fields for changes made by a request, by request.user unless a user is given """
+    if user is None:
+        user = getattr(request, 'user', None)
+    attribution = {}
+    if user is not None and user.is_authenticated() and isinstance(user, get_user_model()):
+        attribution['user'] = user
+    if request.META.get('REMOTE_ADDR'):
+        attribution['remote_addr'] = request.META.get('REMOTE_ADDR')
+    if request.META.get('REMOTE_HOST'):
+        attribution['remote_host'] = request.META.get('REMOTE_HOST')
+    return attribution
+
+
+@contextmanager
+def attribute_changes(**attribution):
+    """ attribute changes made inside the block, on top of any current attribution """
+    token = request_attribution.set(dict(request_attribution.get() or {}, **attribution))
+    try:
+        yield
+    finally:
+        request_attribution.reset(token)
+
+
+# (models, actions) scopes audit logging is disabled in, None for all of either, see auditlog.utils.disable_audit
+disabled_scopes = ContextLocal('auditlog_disabled_scopes', default=())
+
+
+def is_audit_disabled(model=None, action=None):
+    for models, actions in disabled_scopes.get():
+        if (models is None or model in models) and (actions is None or action in actions):
+            return True
+    return False
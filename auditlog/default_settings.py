@@ -5,8 +5,70 @@ defaults = {
     'DISPATCH_UID': 'AUDIT_LOG',
     'AUDIT_META_NAME': '_audit_meta',
     'CHANGE_LOGGING': True,
+    # send the audit_request signal for requests through AuditMiddleware, for those picked by sampling and the
+    # rate limit below (see auditlog.sampling). Nothing about a request is captured if it has no receivers
     'REQUEST_LOGGING': True,
+    # the share of requests logged, and by path prefix, username and response status code (or '5xx' etc)
+    'REQUEST_SAMPLE_RATE': 1.0,
+    'REQUEST_SAMPLE_PATHS': {},
+    'REQUEST_SAMPLE_USERS': {},
+    'REQUEST_SAMPLE_STATUS': {},
+    # the most requests logged a second by each process, and at once (default: the rate). None: no limit
+    'REQUEST_RATE_LIMIT': None,
+    'REQUEST_RATE_BURST': None,
     'APP_LABEL': 'auditlog', # this setting only does anything in django 1.7+
+    # remember field values when tracked instances are loaded so updates and deletes don't need to select
+    # the current row first (django 1.8+). Can also be set per model with AuditLog.decorate(snapshot_on_load=...)
+    'SNAPSHOT_ON_LOAD': False,
+    # the alias of a database of its own to keep the audit log in, with auditlog.routers.AuditRouter in
+    # DATABASE_ROUTERS. None keeps it in the default database
+    'DATABASE': None,
+    # where changes are written, see auditlog.sinks
+    'SINKS': [{'BACKEND': 'auditlog.sinks.DatabaseSink'}],
+    # 'immediate' saves each change as it happens, 'buffered' collects them and writes them in bulk when the
+    # transaction commits or the request ends (see auditlog.buffer), 'async' hands them to background
+    # threads once the transaction commits (see auditlog.writer)
+    'WRITE_MODE': 'immediate',
+    # the most changes 'buffered' mode holds before writing them
+    'BUFFER_SIZE': 500,
+    # 'async' mode: how many changes can be waiting, what to do when that's reached ('block', 'write' or
+    # 'drop'), the number of writer threads, and how many changes they write at once, waiting at most
+    # ASYNC_FLUSH_INTERVAL seconds for a batch to fill up
+    'ASYNC_QUEUE_SIZE': 10000,
+    'ASYNC_OVERFLOW': 'block',
+    'ASYNC_WORKERS': 1,
+    'ASYNC_BATCH_SIZE': 500,
+    'ASYNC_FLUSH_INTERVAL': 1.0,
+    # days to keep changes for and where to archive them before they're removed, used by the
+    # auditlog_retention command. None keeps changes forever / doesn't archive them
+    'RETENTION_DAYS': None,
+    'ARCHIVE_DIR': None,
+    # write a FieldChange row for each field an update changes, which ModelChange.objects.field_changed uses
+    'INDEX_CHANGED_FIELDS': False,
+    # store only the old values of the fields an update changes instead of the whole pre_change_state,
+    # with a full one kept on about one in CHECKPOINT_INTERVAL updates (None: never) to replay states from,
+    # see ModelChange.reconstruct_state
+    'COMPACT_STORAGE': False,
+    'CHECKPOINT_INTERVAL': 50,
+    # 'native' stores ModelChange payloads as jsonb on PostgreSQL, 'text' as text everywhere. Takes effect
+    # when the columns are created or migrated
+    'JSON_STORAGE': 'text',
+    # dotted paths of the functions used to encode and decode payloads, None for auditlog.encoding's defaults
+    # (orjson if installed, otherwise the json module)
+    'JSON_DUMPS': None,
+    'JSON_LOADS': None,
+    # compress payloads of at least COMPRESSION_THRESHOLD characters with 'zlib' or 'lzma' (python 3), None
+    # doesn't compress. Existing rows can be changed over with the auditlog_recompress command
+    'COMPRESSION': None,
+    'COMPRESSION_THRESHOLD': 4096,
+    # store a hash with each change that chains it to the one before it to the same model type, so changed
+    # or removed rows can be found (see auditlog.chain and the auditlog_verify command)
+    'HASH_CHAIN': False,
+    # tune the admin for tables too large to count or page through with offsets: estimated counts (on
+    # PostgreSQL), pages by id and text boxes to filter by user and model, see auditlog.admin
+    'ADMIN_LARGE_TABLE': False,
+    # below this many estimated rows the admin counts them exactly anyway
+    'ADMIN_EXACT_COUNT_LIMIT': 10000,
 }
 
 
@@ -0,0 +1,75 @@
+"""
+JSON encoding of ModelChange payloads
+
+orjson is used when it's installed, the stdlib json module otherwise. The JSON_DUMPS and JSON_LOADS settings
+can name other functions (as dotted paths) to use instead.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import datetime
+import decimal
+import json
+import uuid
+from django.utils import six
+from django.utils.encoding import force_text
+from django.utils.functional import Promise
+from django.utils.module_loading import import_string
+
+from .default_settings import settings as audit_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default(value):
+    """ JSON compatible versions of the values model fields commonly hold """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (decimal.Decimal, uuid.UUID, Promise)):
+        return force_text(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def stdlib_dumps(value):
+    return six.text_type(json.dumps(value, default=default, separators=(',', ':')))
+
+
+def stdlib_loads(value):
+    return json.loads(value)
+
+
+if orjson is not None:
+    def orjson_dumps(value):
+        return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    orjson_loads = orjson.loads
+    default_dumps, default_loads = orjson_dumps, orjson_loads
+else:
+    default_dumps, default_loads = stdlib_dumps, stdlib_loads
+
+
+_imported = {}
+
+
+def _get_function(path, fallback):
+    if not path:
+        return fallback
+    function = _imported.get(path)
+    if function is None:
+        function = _imported[path] = import_string(path)
+    return function
+
+
+def dumps(value):
+    """ the JSON text for a value """
+    return _get_function(audit_settings.JSON_DUMPS, default_dumps)(value)
+
+
+def loads(value):
+    return _get_function(audit_settings.JSON_LOADS, default_loads)(value)
@@ -0,0 +1,77 @@
+"""
+Reading the tracked field values of model instances, the fast replacement for model_to_dict in the audit path
+"""
+from __future__ import unicode_literals, absolute_import
+
+import copy
+from operator import attrgetter
+
+
+def _copy_value(value):
+    # mutable values are copied so in place changes on the instance still show up in the diff
+    if isinstance(value, (dict, list, set)):
+        return copy.copy(value)
+    return value
+
+
+class FieldExtractor(object):
+    """
+    the concrete editable fields of a model, only those in `fields` if given and minus `exclude`, worked out
+    once. Values are read as tuples in field order, which compare position by position; foreign keys give
+    their id like model_to_dict.
+    """
+    def __init__(self, model, exclude=(), fields=None):
+        def tracked(field):
+            return field.editable and field.name not in exclude and (fields is None or field.name in fields)
+
+        tracked_fields = [field for field in model._meta.concrete_fields if tracked(field)]
+        self.names = tuple(field.name for field in tracked_fields)
+        self.attnames = tuple(field.attname for field in tracked_fields)
+        # (name, attname) pairs
+        self.fields = tuple(zip(self.names, self.attnames))
+        # not part of the state, see AuditLog.m2m_changed_handler
+        self.m2m_fields = tuple(field for field in model._meta.many_to_many if tracked(field))
+        # field names by name or attname, as save's update_fields can have either
+        self.names_by_key = dict(self.fields + tuple(zip(self.names, self.names)))
+        self.attnames_by_name = dict(self.fields)
+        if len(self.attnames) > 1:
+            self.get_values = attrgetter(*self.attnames)
+        elif self.attnames:
+            getter = attrgetter(self.attnames[0])
+            self.get_values = lambda instance: (getter(instance),)
+        else:
+            self.get_values = lambda instance: ()
+
+    def tracked_names(self, keys):
+        """ the names of the tracked fields among field names or attnames """
+        return set(self.names_by_key[key] for key in keys if key in self.names_by_key)
+
+    def values(self, instance):
+        return self.get_values(instance)
+
+    def copied_values(self, instance):
+        """ values that stay the same when mutable attributes of the instance are changed in place """
+        return tuple(_copy_value(value) for value in self.get_values(instance))
+
+    def partial_state(self, instance, names):
+        """ the values of some of the tracked fields of an instance as a dict """
+        return dict((name, getattr(instance, self.attnames_by_name[name])) for name in names)
+
+    def to_dict(self, values):
+        return dict(zip(self.names, values))
+
+    def diff(self, old_values, new_values):
+        """ name -> new value for the fields that differ between two value tuples """
+        if old_values == new_values:
+            return {}
+        return dict(
+            (name, new_value) for name, old_value, new_value in zip(self.names, old_values, new_values)
+            if old_value != new_value
+        )
+
+    def state(self, instance):
+        """
+        the tracked values of an instance as a dict, like model_to_dict without many to many fields. Those
+        would take a query each, changes to them are logged from m2m_changed instead
+        """
+        return self.to_dict(self.get_values(instance))
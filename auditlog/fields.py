@@ -0,0 +1,94 @@
+"""
+The JSON field ModelChange payloads are stored in
+"""
+from __future__ import unicode_literals, absolute_import
+
+import django
+from django.db import models
+from django.utils import six
+
+from .default_settings import settings as audit_settings
+from . import compression, encoding
+
+
+class EncodedJSON(six.text_type):
+    """ a payload as stored (JSON text, or compressed JSON) that hasn't been decoded yet """
+
+
+def decode(value):
+    return encoding.loads(compression.to_json(value))
+
+
+# django < 1.8 doesn't call from_db_value, loaded values are set on the instance as plain strings
+_MARKS_LOADED_VALUES = django.VERSION >= (1, 8)
+
+
+class LazyJSONDescriptor(object):
+    """ decodes the JSON text loaded for a field the first time the attribute is read """
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.field.attname]
+        if isinstance(value, EncodedJSON):
+            value = instance.__dict__[self.field.attname] = decode(value)
+        return value
+
+    def __set__(self, instance, value):
+        if not _MARKS_LOADED_VALUES and isinstance(value, six.string_types):
+            value = EncodedJSON(value)
+        instance.__dict__[self.field.attname] = value
+
+
+class JSONField(models.Field):
+    """
+    JSON stored as text, or as jsonb on PostgreSQL when the JSON_STORAGE setting is 'native' (the setting
+    applies when the column is created or migrated). Large values are compressed with the COMPRESSION setting,
+    into a JSON string on jsonb columns.
+
+    Values are only decoded (and decompressed) when the attribute is read, values() and values_list() give
+    them as stored. psycopg2 does decode jsonb itself, apart from compressed values.
+    """
+    description = 'JSON data'
+
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super(JSONField, self).contribute_to_class(cls, name, *args, **kwargs)
+        setattr(cls, self.name, LazyJSONDescriptor(self))
+
+    def db_type(self, connection):
+        if audit_settings.JSON_STORAGE == 'native' and connection.vendor == 'postgresql':
+            return 'jsonb'
+        return connection.data_types['TextField']
+
+    def get_internal_type(self):
+        return 'TextField'
+
+    def from_db_value(self, value, expression, connection, *args):
+        # django < 2.0 passes a context too
+        if isinstance(value, six.string_types):
+            return EncodedJSON(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, six.string_types):
+            return decode(value)
+        return value
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, EncodedJSON):
+            return six.text_type(value)
+        return compression.to_stored(encoding.dumps(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is not None and compression.is_compressed(value) and self.db_type(connection) == 'jsonb':
+            value = encoding.stdlib_dumps(value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.get_prep_value(self.value_from_object(obj))
@@ -0,0 +1,65 @@
+"""
+Reconstructing the state of tracked objects at a point in time from their changes
+"""
+from __future__ import unicode_literals, absolute_import
+
+from collections import OrderedDict
+from itertools import groupby
+
+from .models import apply_change
+
+
+def replay_changes(changes, states=None):
+    """
+    fold changes ordered by (model_pk, timestamp) into the states of their objects, yielding a
+    (model_pk, state) pair for each object. `states` holds the states to start from, by model_pk
+    """
+    states = states or {}
+    for model_pk, object_changes in groupby(changes, key=lambda change: change.model_pk):
+        state = states.get(model_pk)
+        for change in object_changes:
+            state = apply_change(state, change)
+        yield model_pk, state
+
+
+class StateCache(object):
+    """
+    states reconstructed by AuditLog.Manager.as_of, so a later call for a time after a cached one only replays
+    the changes in between. The most recently cached `size` results are kept.
+
+    Cached states don't see changes written afterwards with an earlier timestamp, like ones still waiting
+    in the 'async' write mode's queue.
+    """
+    def __init__(self, size=16):
+        self.size = size
+        # (model_type_id, timestamp, frozenset of model pks or None for all objects) -> {model_pk: state}
+        self.entries = OrderedDict()
+
+    def get(self, model_type_id, timestamp, pks=None):
+        """
+        the latest cached (timestamp, states) at or before `timestamp` that has all of `pks` (None: every
+        object), (None, {}) if there isn't one
+        """
+        best = None
+        for key in self.entries:
+            entry_type_id, entry_timestamp, entry_pks = key
+            if entry_type_id != model_type_id or entry_timestamp > timestamp:
+                continue
+            if entry_pks is not None and (pks is None or not entry_pks.issuperset(pks)):
+                continue
+            if best is None or entry_timestamp > best[1]:
+                best = key
+        if best is None:
+            return None, {}
+
+        states = self.entries[best]
+        if pks is not None:
+            states = dict((pk, states[pk]) for pk in pks if pk in states)
+        return best[1], states
+
+    def set(self, model_type_id, timestamp, pks, states):
+        key = (model_type_id, timestamp, frozenset(pks) if pks is not None else None)
+        self.entries.pop(key, None)
+        self.entries[key] = states
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
@@ -0,0 +1,197 @@
+from __future__ import unicode_literals
+
+import csv
+import gzip
+import json
+import sys
+from datetime import datetime, time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+from django.utils import six, timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.encoding import force_text
+
+from auditlog import compression, encoding
+from auditlog.fields import EncodedJSON
+from auditlog.models import ModelChange
+from auditlog.utils import get_content_type, get_user_ids
+
+
+COLUMNS = ('id', 'timestamp', 'action', 'model', 'model_pk', 'user_id', 'username', 'remote_addr', 'remote_host',
+           'compact', 'pre_change_state', 'changes')
+
+
+def payload_json(value):
+    """ the JSON text of a payload read with values_list, without decoding it if it is stored as text """
+    if value is None:
+        return 'null'
+    if isinstance(value, EncodedJSON):
+        return compression.to_json(value)
+    return encoding.dumps(value)
+
+
+def parse_time(value, end=False):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError('Invalid date or time: {}'.format(value))
+        # a whole day, an end date includes it
+        parsed = datetime.combine(day, time.max if end else time.min)
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
+class CSVFormatter(object):
+    """ formats one CSV row at a time """
+    def __init__(self):
+        self.buffer = six.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def format(self, row):
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        if six.PY2:
+            # the python 2 csv module only handles bytes
+            row = [force_text(value).encode('utf-8') for value in row]
+            self.writer.writerow(row)
+            return self.buffer.getvalue().decode('utf-8')
+        self.writer.writerow(row)
+        return self.buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = ('Exports audit log changes as JSON lines or CSV, optionally gzipped, reading them in batches by id '
+            'so memory use stays the same however many there are. An interrupted export can be continued '
+            'with --start-after set to the last id written, which appends to the output file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='file to write to, - for standard output (default)')
+        parser.add_argument('--format', default='jsonl', help='jsonl (default) or csv')
+        parser.add_argument('--gzip', action='store_true', default=False, help='gzip the output file')
+        parser.add_argument('--model', action='append', default=[],
+                            help='only changes to this model, as app_label.model_name, can be repeated')
+        parser.add_argument('--user', default=None, help='only changes by this user, by id or username')
+        parser.add_argument('--action', action='append', default=[], help='only these actions, can be repeated')
+        parser.add_argument('--since', default=None, help='only changes at or after this date or time')
+        parser.add_argument('--until', default=None, help='only changes at or before this date or time')
+        parser.add_argument('--start-after', type=int, default=None, help='only changes with a larger id')
+        parser.add_argument('--batch-size', type=int, default=2000, help='rows read at once')
+        parser.add_argument('--database', default=None, help='database alias, defaults to the routed one')
+
+    def handle(self, *args, **options):
+        if options['format'] not in ('jsonl', 'csv'):
+            raise CommandError('Unknown format {}, use jsonl or csv'.format(options['format']))
+        if options['gzip'] and options['output'] == '-':
+            raise CommandError('--gzip needs an --output file')
+        self.using = options['database'] or router.db_for_read(ModelChange)
+        queryset = self.get_queryset(options)
+
+        # looked up once, content types all at the start and users as they turn up. Both from their own
+        # database, which needn't be the audit log's
+        self.models = dict(
+            (content_type.pk, '{}.{}'.format(content_type.app_label, content_type.model))
+            for content_type in ContentType.objects.all()
+        )
+        self.usernames = {}
+        formatter = CSVFormatter() if options['format'] == 'csv' else None
+
+        output, close = self.open_output(options)
+        count = 0
+        last_pk = options['start_after']
+        try:
+            if formatter is not None and last_pk is None:
+                self.write(output, formatter.format(COLUMNS))
+            while True:
+                batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+                rows = list(batch.values_list(
+                    'pk', 'timestamp', 'action', 'model_type_id', 'model_pk', 'user_id', 'remote_addr',
+                    'remote_host', 'compact', 'pre_change_state', 'changes',
+                )[:options['batch_size']])
+                if not rows:
+                    break
+                self.load_usernames(set(row[5] for row in rows))
+                self.write(output, ''.join(
+                    self.format_csv(formatter, row) if formatter is not None else self.format_json(row)
+                    for row in rows
+                ))
+                output.flush()
+                count += len(rows)
+                last_pk = rows[-1][0]
+                if options['verbosity'] > 1:
+                    self.stderr.write('Exported changes up to id {}'.format(last_pk))
+        finally:
+            if close:
+                output.close()
+        if options['verbosity'] > 0:
+            self.stderr.write('Exported {} changes, the last id was {}'.format(count, last_pk))
+
+    def get_queryset(self, options):
+        queryset = ModelChange.objects.using(self.using).order_by('pk')
+        if options['model']:
+            content_types = []
+            for label in options['model']:
+                try:
+                    content_types.append(get_content_type(label))
+                except ValueError:
+                    raise CommandError('Unknown model {}'.format(label))
+            queryset = queryset.filter(model_type_id__in=[content_type.pk for content_type in content_types])
+        if options['user']:
+            queryset = queryset.filter(user_id__in=get_user_ids(options['user']))
+        if options['action']:
+            queryset = queryset.filter(action__in=[action.upper() for action in options['action']])
+        if options['since']:
+            queryset = queryset.filter(timestamp__gte=parse_time(options['since']))
+        if options['until']:
+            queryset = queryset.filter(timestamp__lte=parse_time(options['until'], end=True))
+        return queryset
+
+    def open_output(self, options):
+        """ (binary file, whether to close it) """
+        if options['output'] == '-':
+            return getattr(sys.stdout, 'buffer', sys.stdout), False
+        mode = 'ab' if options['start_after'] is not None else 'wb'
+        if options['gzip']:
+            # appending adds a gzip member, which readers handle like one file
+            return gzip.open(options['output'], mode), True
+        return open(options['output'], mode), True
+
+    def write(self, output, text):
+        output.write(text.encode('utf-8'))
+
+    def load_usernames(self, user_ids):
+        missing = [user_id for user_id in user_ids if user_id is not None and user_id not in self.usernames]
+        if missing:
+            user_model = get_user_model()
+            self.usernames.update(user_model._default_manager.filter(pk__in=missing).values_list(
+                'pk', user_model.USERNAME_FIELD))
+
+    def format_json(self, row):
+        pk, timestamp, action, model_type_id, model_pk, user_id, remote_addr, remote_host, compact, pre, changes = row
+        metadata = json.dumps({
+            'id': pk,
+            'timestamp': timestamp.isoformat(),
+            'action': action,
+            'model': self.models.get(model_type_id),
+            'model_pk': model_pk,
+            'user_id': user_id,
+            'username': self.usernames.get(user_id),
+            'remote_addr': remote_addr,
+            'remote_host': remote_host,
+            'compact': compact,
+        }, sort_keys=True)
+        # the payloads are spliced in as they are stored rather than decoded and encoded again
+        return '{},"pre_change_state":{},"changes":{}}}\n'.format(
+            metadata[:-1], payload_json(pre), payload_json(changes))
+
+    def format_csv(self, formatter, row):
+        pk, timestamp, action, model_type_id, model_pk, user_id, remote_addr, remote_host, compact, pre, changes = row
+        return formatter.format([
+            pk, timestamp.isoformat(), action, self.models.get(model_type_id, ''), model_pk,
+            user_id if user_id is not None else '', self.usernames.get(user_id, ''), remote_addr or '',
+            remote_host or '', compact, payload_json(pre), payload_json(changes),
+        ])
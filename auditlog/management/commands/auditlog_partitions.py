@@ -0,0 +1,33 @@
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auditlog import partitioning
+
+
+class Command(BaseCommand):
+    help = ('Creates the upcoming monthly partitions of the audit log table, run it at least monthly. '
+            'With --convert, first rebuilds an existing table as a partitioned table. PostgreSQL 11+ only.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='how many months after the current one to create partitions for')
+        parser.add_argument('--convert', action='store_true', default=False,
+                            help='convert the table to a partitioned table, locking it while the rows are copied')
+        parser.add_argument('--database', default=None, help='database alias, defaults to the routed one')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not partitioning.supports_partitioning(partitioning.get_connection(using)):
+            raise CommandError('Partitioning needs PostgreSQL 11 or later')
+
+        if options['convert']:
+            if partitioning.is_partitioned(using):
+                raise CommandError('The audit log table is already partitioned')
+            partitioning.convert_table(months_ahead=options['months_ahead'], using=using)
+            self.stdout.write('Converted the audit log table to a partitioned table')
+        elif not partitioning.is_partitioned(using):
+            raise CommandError('The audit log table is not partitioned, use --convert to convert it')
+
+        for name in partitioning.create_partitions(months_ahead=options['months_ahead'], using=using):
+            self.stdout.write('Created partition {}'.format(name))
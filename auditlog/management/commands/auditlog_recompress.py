@@ -0,0 +1,57 @@
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+
+from auditlog import compression, encoding
+from auditlog.fields import EncodedJSON
+from auditlog.models import ModelChange
+
+
+def restore(value):
+    """ the value to store for a payload with the current COMPRESSION settings, None if it stays the same """
+    if value is None:
+        return None
+    if isinstance(value, EncodedJSON):
+        stored = compression.to_stored(compression.to_json(value))
+        return EncodedJSON(stored) if stored != value else None
+    # decoded by the database driver, so it isn't compressed
+    stored = compression.to_stored(encoding.dumps(value))
+    return EncodedJSON(stored) if compression.is_compressed(stored) else None
+
+
+class Command(BaseCommand):
+    help = ('Rewrites the payloads of existing audit log changes with the current COMPRESSION settings, '
+            'compressing large ones or decompressing them if compression was turned off. Rows are read in '
+            'batches by id, so the command can be stopped and continued with --start-after.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='rows read and updated at once')
+        parser.add_argument('--start-after', type=int, default=None, help='only rows with a larger id')
+        parser.add_argument('--database', default=None, help='database alias, defaults to the routed one')
+
+    def handle(self, *args, **options):
+        using = options['database'] or router.db_for_write(ModelChange)
+        changes = ModelChange.objects.using(using).order_by('pk')
+        last_pk = options['start_after']
+        scanned = rewritten = 0
+        while True:
+            batch = changes if last_pk is None else changes.filter(pk__gt=last_pk)
+            rows = list(batch.values_list('pk', 'pre_change_state', 'changes')[:options['batch_size']])
+            if not rows:
+                break
+            with transaction.atomic(using=using):
+                for pk, pre_change_state, changed in rows:
+                    values = dict(
+                        (name, stored) for name, stored in (
+                            ('pre_change_state', restore(pre_change_state)), ('changes', restore(changed)))
+                        if stored is not None
+                    )
+                    if values:
+                        changes.filter(pk=pk).update(**values)
+                        rewritten += 1
+            scanned += len(rows)
+            last_pk = rows[-1][0]
+            if options['verbosity'] > 1:
+                self.stdout.write('Checked changes up to id {}'.format(last_pk))
+        self.stdout.write('Rewrote {} of {} changes'.format(rewritten, scanned))
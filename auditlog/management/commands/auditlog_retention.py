@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+
+import os
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.utils import timezone
+
+from auditlog import chain, partitioning
+from auditlog.archive import archive_changes
+from auditlog.default_settings import settings as audit_settings
+from auditlog.models import FieldChange, ModelChange
+
+
+class Command(BaseCommand):
+    help = ('Removes audit log changes older than the retention period, archiving them to gzipped JSON lines '
+            'files first if an archive directory is given. Partitions that have expired as a whole are dropped, '
+            'on tables that are not partitioned the rows are deleted in batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='retention period, defaults to the RETENTION_DAYS setting')
+        parser.add_argument('--archive-dir', default=None,
+                            help='where to write archives, defaults to the ARCHIVE_DIR setting')
+        parser.add_argument('--batch-size', type=int, default=2000, help='rows read or deleted at once')
+        parser.add_argument('--database', default=None, help='database alias, defaults to the routed one')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else audit_settings.RETENTION_DAYS
+        if days is None:
+            raise CommandError('No retention period, pass --days or set RETENTION_DAYS')
+        self.archive_dir = options['archive_dir'] or audit_settings.ARCHIVE_DIR
+        if self.archive_dir and not os.path.isdir(self.archive_dir):
+            raise CommandError('Archive directory {} does not exist'.format(self.archive_dir))
+        self.batch_size = options['batch_size']
+        self.using = options['database'] or router.db_for_write(ModelChange)
+
+        cutoff = timezone.now() - timedelta(days=days)
+        if partitioning.is_partitioned(self.using):
+            self.expire_partitions(cutoff)
+        else:
+            self.expire_rows(cutoff)
+
+    def archive(self, queryset, name):
+        if not self.archive_dir:
+            return None
+        path = os.path.join(self.archive_dir, '{}.jsonl.gz'.format(name))
+        count, last_pk = archive_changes(queryset, path, chunk_size=self.batch_size)
+        self.stdout.write('Archived {} changes to {}'.format(count, path))
+        return last_pk
+
+    def move_chain_starts(self, queryset):
+        # before anything is removed, so the chains are never missing their start
+        with transaction.atomic(using=self.using):
+            chain.move_chain_starts(queryset, using=self.using)
+
+    def expire_partitions(self, cutoff):
+        # a partition goes once all of it is older than the cutoff, so up to a month more is kept
+        for partition in partitioning.get_partitions(self.using):
+            if partition.end > cutoff:
+                break
+            changes = ModelChange.objects.using(self.using).filter(
+                timestamp__gte=partition.start, timestamp__lt=partition.end)
+            self.archive(changes, partition.name)
+            self.move_chain_starts(changes)
+            # field changes have no foreign key constraint to notice the partition going
+            FieldChange.objects.using(self.using).filter(
+                timestamp__gte=partition.start, timestamp__lt=partition.end).delete()
+            partitioning.drop_partition(partition, using=self.using)
+            self.stdout.write('Dropped partition {}'.format(partition.name))
+
+    def expire_rows(self, cutoff):
+        expired = ModelChange.objects.using(self.using).filter(timestamp__lt=cutoff)
+        if self.archive_dir:
+            last_pk = self.archive(expired, '{}_until_{:%Y%m%d%H%M%S}'.format(ModelChange._meta.db_table, cutoff))
+            if last_pk is None:
+                return
+            # anything written since wasn't archived
+            expired = expired.filter(pk__lte=last_pk)
+
+        self.move_chain_starts(expired)
+        deleted = 0
+        while True:
+            pks = list(expired.order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                break
+            ModelChange.objects.using(self.using).filter(pk__in=pks).delete()
+            deleted += len(pks)
+        self.stdout.write('Deleted {} changes'.format(deleted))
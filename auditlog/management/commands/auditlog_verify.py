@@ -0,0 +1,81 @@
+from __future__ import unicode_literals
+
+import multiprocessing
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from auditlog.chain import verify_chain
+from auditlog.models import HashChainHead, ModelChange
+from auditlog.utils import get_content_type
+
+
+def _init_worker():
+    import django
+    # processes that aren't forked start without django set up
+    django.setup()
+
+
+def _verify(args):
+    model_type_id, using, batch_size = args
+    return verify_chain(model_type_id, using=using, batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = ('Checks the hash chains of the audit log (see the HASH_CHAIN setting), reporting changes that were '
+            'altered or removed. Each model type has a chain of its own, which are checked in parallel with '
+            '--workers. Fails if any chain is broken.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', default=[],
+                            help='only the chain of this model, as app_label.model_name, can be repeated')
+        parser.add_argument('--workers', type=int, default=1, help='processes checking chains at once')
+        parser.add_argument('--batch-size', type=int, default=2000, help='rows read at once')
+        parser.add_argument('--database', default=None, help='database alias, defaults to the routed one')
+
+    def handle(self, *args, **options):
+        using = options['database'] or router.db_for_read(ModelChange)
+        if options['model']:
+            model_type_ids = []
+            for label in options['model']:
+                try:
+                    model_type_ids.append(get_content_type(label).pk)
+                except ValueError:
+                    raise CommandError('Unknown model {}'.format(label))
+        else:
+            # the rows with a hash too, in case a head was removed
+            model_type_ids = sorted(set(HashChainHead.objects.using(using).values_list(
+                'model_type_id', flat=True)) | set(ModelChange.objects.using(using).filter(
+                chain_hash__isnull=False).order_by().values_list('model_type_id', flat=True).distinct()))
+
+        tasks = [(model_type_id, using, options['batch_size']) for model_type_id in model_type_ids]
+        if options['workers'] > 1 and len(tasks) > 1:
+            # the workers open connections of their own, forked ones mustn't share this one
+            for connection in connections.all():
+                connection.close()
+            pool = multiprocessing.Pool(min(options['workers'], len(tasks)), initializer=_init_worker)
+            try:
+                results = pool.map(_verify, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [_verify(task) for task in tasks]
+
+        failed = 0
+        for result in results:
+            content_type = ContentType.objects.get_for_id(result.model_type_id)
+            label = '{}.{}'.format(content_type.app_label, content_type.model)
+            if result.broken or not result.head_found:
+                failed += 1
+            if result.broken:
+                self.stderr.write('{}: {} changes do not match their hashes or have none, ids {}'.format(
+                    label, len(result.broken), ', '.join(str(pk) for pk in result.broken)))
+            if not result.head_found:
+                self.stderr.write('{}: the newest changes are missing'.format(label))
+            if options['verbosity'] > 1:
+                self.stdout.write('{}: checked {} changes'.format(label, result.checked))
+        if failed:
+            raise CommandError('{} of {} hash chains are broken'.format(failed, len(results)))
+        self.stdout.write('Checked {} hash chains, {} changes'.format(
+            len(results), sum(result.checked for result in results)))
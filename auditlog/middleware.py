@@ -1,10 +1,13 @@
 from __future__ import unicode_literals
 
-from functools import partial
-from django.contrib.auth import get_user_model
+import time
+from django.utils import timezone
 
+from .buffer import change_buffer
+from .context import get_request_attribution, is_audit_disabled, request_attribution
 from .default_settings import settings
-from . import signals
+from .sampling import request_sampler
+from .signals import audit_request
 
 
 class AuditMiddleware(object):
@@ -14,35 +17,49 @@ class AuditMiddleware(object):
     """
 
     def process_request(self, request, *args, **kwargs):
-        if not settings.CHANGE_LOGGING:
-            return
+        change_buffer.begin_request()
 
-        user = getattr(request, 'user', None)
+        # always set, so nothing from an earlier request that wasn't ended properly is used
+        attribution = get_request_attribution(request) if settings.CHANGE_LOGGING else None
+        request._audit_context_token = request_attribution.set(attribution)
 
-        if user and not user.is_authenticated():
-            user = None
-
-        # build kwargs to pass to the signal handler
-        update_kwargs = {}
-        if user and isinstance(user, get_user_model()):
-            update_kwargs['user'] = user
-        if request.META.get('REMOTE_ADDR'):
-            update_kwargs['remote_addr'] = request.META.get('REMOTE_ADDR')
-        if request.META.get('REMOTE_HOST'):
-            update_kwargs['remote_host'] = request.META.get('REMOTE_HOST')
-
-        # keep the strong ref on the request, its a sane lifetime
-        request._handler_func = partial(self.pre_action_handler, update_kwargs=update_kwargs)
-
-        signals.audit_presave.connect(request._handler_func, dispatch_uid=(settings.DISPATCH_UID, request,),)
+        # sampled before anything is captured, rules on the status are only decided with the response
+        if self.should_log_request():
+            if settings.REQUEST_SAMPLE_STATUS:
+                request._audit_request_log = (time.time(), None)
+            elif request_sampler.decide(request):
+                request._audit_request_log = (time.time(), True)
 
     def process_response(self, request, response):
-        # disconnect signals for this request
-        # runs even if change logging is disabled in case it was disabled after the signal was created
-        signals.audit_presave.disconnect(dispatch_uid=(settings.DISPATCH_UID, request,))
+        if hasattr(request, '_audit_context_token'):
+            request_attribution.reset(request._audit_context_token)
+            del request._audit_context_token
+        # write changes buffered outside of a transaction
+        change_buffer.end_request()
+
+        if hasattr(request, '_audit_request_log'):
+            started, sampled = request._audit_request_log
+            del request._audit_request_log
+            if not self.should_log_request():
+                return response
+            status_code = getattr(response, 'status_code', None)
+            if sampled or request_sampler.decide(request, status_code):
+                self.log_request(request, response, status_code, started)
 
         return response
 
-    def pre_action_handler(self, sender, model_instance, audit_meta, update_kwargs=None, **kwargs):
-        if audit_meta and getattr(audit_meta, 'audit') and update_kwargs is not None:
-            audit_meta.update_additional_kwargs(update_kwargs)
+    def should_log_request(self):
+        # disable_audit without models or actions turns request logging off as well
+        return (settings.REQUEST_LOGGING and not is_audit_disabled() and
+                audit_request.has_listeners(self.__class__))
+
+    def log_request(self, request, response, status_code, started):
+        record = get_request_attribution(request)
+        record.update({
+            'method': request.method,
+            'path': request.path,
+            'status_code': status_code,
+            'duration': time.time() - started,
+            'timestamp': timezone.now(),
+        })
+        audit_request.send(sender=self.__class__, request=request, response=response, record=record)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+from auditlog.default_settings import settings as audit_settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (audit_settings.APP_LABEL, '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='modelchange',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
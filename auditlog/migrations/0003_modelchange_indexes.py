@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+from auditlog.default_settings import settings as audit_settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (audit_settings.APP_LABEL, '0002_modelchange_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='modelchange',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, db_index=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='modelchange',
+            index_together=set([('model_type', 'model_pk', 'timestamp'), ('user', 'timestamp')]),
+        ),
+    ]
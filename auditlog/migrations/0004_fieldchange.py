@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from auditlog.default_settings import settings as audit_settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        (audit_settings.APP_LABEL, '0003_modelchange_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldChange',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('field_name', models.CharField(max_length=255)),
+                ('timestamp', models.DateTimeField(db_index=True)),
+                ('change', models.ForeignKey(related_name='field_changes', to=audit_settings.APP_LABEL + '.ModelChange', db_constraint=False)),
+                ('model_type', models.ForeignKey(related_name='+', to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='fieldchange',
+            index_together=set([('model_type', 'field_name', 'timestamp'), ('field_name', 'timestamp')]),
+        ),
+    ]
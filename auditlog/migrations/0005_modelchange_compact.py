@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from auditlog.default_settings import settings as audit_settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (audit_settings.APP_LABEL, '0004_fieldchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelchange',
+            name='compact',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+import auditlog.fields
+
+from auditlog.default_settings import settings as audit_settings
+
+
+def convert_columns(apps, schema_editor, db_type='jsonb'):
+    # django doesn't cast existing values when changing the column type, so native storage is set up here
+    connection = schema_editor.connection
+    if audit_settings.JSON_STORAGE != 'native' or connection.vendor != 'postgresql':
+        return
+    model = apps.get_model(audit_settings.APP_LABEL, 'ModelChange')
+    quote = schema_editor.quote_name
+    for name in ('pre_change_state', 'changes'):
+        schema_editor.execute('ALTER TABLE {table} ALTER COLUMN {column} TYPE {type} USING {column}::{type}'.format(
+            table=quote(model._meta.db_table), column=quote(name), type=db_type))
+
+
+def revert_columns(apps, schema_editor):
+    convert_columns(apps, schema_editor, db_type='text')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (audit_settings.APP_LABEL, '0005_modelchange_compact'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(convert_columns, revert_columns),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='modelchange',
+                    name='changes',
+                    field=auditlog.fields.JSONField(null=True, blank=True),
+                ),
+                migrations.AlterField(
+                    model_name='modelchange',
+                    name='pre_change_state',
+                    field=auditlog.fields.JSONField(null=True, blank=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from auditlog.default_settings import settings as audit_settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (audit_settings.APP_LABEL, '0006_json_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='modelchange',
+            name='action',
+            field=models.CharField(max_length=6, choices=[('UPDATE', 'UPDATE'), ('CREATE', 'CREATE'), ('DELETE', 'DELETE'), ('LINK', 'LINK'), ('UNLINK', 'UNLINK')]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+
+from auditlog.default_settings import settings as audit_settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        (audit_settings.APP_LABEL, '0007_modelchange_m2m_actions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='modelchange',
+            name='model_type',
+            field=models.ForeignKey(related_name='+', to='contenttypes.ContentType', db_constraint=False),
+        ),
+        migrations.AlterField(
+            model_name='modelchange',
+            name='user',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, to=settings.AUTH_USER_MODEL, null=True, db_constraint=False),
+        ),
+        migrations.AlterField(
+            model_name='fieldchange',
+            name='model_type',
+            field=models.ForeignKey(related_name='+', to='contenttypes.ContentType', db_constraint=False),
+        ),
+    ]
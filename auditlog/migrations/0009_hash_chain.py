@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from auditlog.default_settings import settings as audit_settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        (audit_settings.APP_LABEL, '0008_audit_database_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HashChainHead',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('hash', models.CharField(max_length=64)),
+                ('start_pk', models.IntegerField(null=True, blank=True)),
+                ('start_hash', models.CharField(default='', max_length=64, blank=True)),
+                ('model_type', models.OneToOneField(related_name='+', to='contenttypes.ContentType', db_constraint=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='modelchange',
+            name='chain_hash',
+            field=models.CharField(max_length=64, null=True, editable=False, blank=True),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from __future__ import unicode_literals, absolute_import
 
-from jsonfield import JSONField
 from django.db import models
+from django.db.models.query import QuerySet
 from django.utils.encoding import python_2_unicode_compatible
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from .fields import JSONField
 
 try:
     # django 1.7
@@ -13,12 +16,36 @@ except ImportError:
     from django.contrib.contenttypes.generic import GenericForeignKey
 
 
-_ACTIONS = ('UPDATE', 'CREATE', 'DELETE')
+_ACTIONS = ('UPDATE', 'CREATE', 'DELETE', 'LINK', 'UNLINK')
+# many to many relations added or removed, changes is {field name: [related pks]}
+M2M_ACTIONS = ('LINK', 'UNLINK')
+
+
+def apply_change(state, change):
+    """ the state of an object after `change`, given its state before it (None if it didn't exist) """
+    if change.action == 'CREATE':
+        return dict(change.changes or {})
+    if change.action == 'DELETE':
+        return None
+    if change.action in M2M_ACTIONS:
+        # states only hold the concrete fields
+        return state
+    if change.compact:
+        # history before the change is missing if state is None, the fields it changed are all that's known
+        state = dict(state or {})
+    else:
+        state = dict(change.pre_change_state or {})
+    state.update(change.changes or {})
+    return state
 
 
 class BaseAuditModel(models.Model):
-    timestamp = models.DateTimeField(auto_now_add=True)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', blank=True, null=True, on_delete=models.SET_NULL)
+    # set when the change is made rather than when it's written, buffered changes are saved later
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
+    # no foreign key constraints to users and content types, which aren't in a dedicated audit database
+    # (see auditlog.routers)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', blank=True, null=True, on_delete=models.SET_NULL,
+                             db_constraint=False)
     remote_addr = models.CharField(max_length=45, blank=True, null=True)
     remote_host = models.TextField(blank=True, null=True)
 
@@ -28,10 +55,91 @@ class BaseAuditModel(models.Model):
         ordering = ['-timestamp']
 
 
+class ModelChangeQuerySet(QuerySet):
+    """ lookups that match the indexes on ModelChange, so they stay fast on large tables """
+
+    def history_for(self, instance):
+        """ changes to a model instance, newest first """
+        return self.filter(
+            model_type=ContentType.objects.get_for_model(instance), model_pk=instance.pk,
+        ).order_by('-timestamp')
+
+    def latest_for(self, instance):
+        """ the most recent change to a model instance, or None """
+        history = self.history_for(instance)[:1]
+        return history[0] if history else None
+
+    def changes_between(self, start=None, end=None, user=None):
+        """ changes in a time range (start inclusive, end exclusive), optionally by a user, newest first """
+        queryset = self
+        if user is not None:
+            queryset = queryset.filter(user=user)
+        if start is not None:
+            queryset = queryset.filter(timestamp__gte=start)
+        if end is not None:
+            queryset = queryset.filter(timestamp__lt=end)
+        return queryset.order_by('-timestamp')
+
+    def field_changed(self, field_name, since=None, until=None, model=None):
+        """
+        updates that changed a field (since inclusive, until exclusive), optionally only for one model class,
+        newest first. Needs the INDEX_CHANGED_FIELDS setting, changes written without it aren't found
+        """
+        lookups = {'field_changes__field_name': field_name}
+        if model is not None:
+            lookups['field_changes__model_type'] = ContentType.objects.get_for_model(model)
+        if since is not None:
+            lookups['field_changes__timestamp__gte'] = since
+        if until is not None:
+            lookups['field_changes__timestamp__lt'] = until
+        # one filter call so every condition applies to the same field change
+        return self.filter(**lookups).order_by('-timestamp')
+
+    def replay(self, model_type_id, model_pk, timestamp, last=None):
+        """
+        the state of an object at `timestamp` (or right after the change `last`), replayed from the
+        nearest change with a full state before it. None if the object didn't exist
+        """
+        history = self.filter(model_type_id=model_type_id, model_pk=model_pk, timestamp__lte=timestamp)
+        if last is not None:
+            history = history.exclude(timestamp=timestamp, pk__gt=last.pk)
+        checkpoint = history.filter(compact=False).order_by('-timestamp', '-pk').first()
+        if checkpoint is not None:
+            history = history.filter(timestamp__gte=checkpoint.timestamp)
+
+        state = None
+        replaying = checkpoint is None
+        for change in history.order_by('timestamp', 'pk').iterator():
+            # changes at the same time as the checkpoint but before it don't count
+            replaying = replaying or change.pk == checkpoint.pk
+            if replaying:
+                state = apply_change(state, change)
+        return state
+
+    def state_at(self, instance, timestamp):
+        """ the field values of a model instance at `timestamp`, None if it didn't exist then """
+        return self.replay(ContentType.objects.get_for_model(instance).pk, instance.pk, timestamp)
+
+
+class ModelChangeManager(models.Manager):
+    """ the lookups of ModelChangeQuerySet on the manager, for django < 1.7 which has no QuerySet.as_manager """
+
+    def get_queryset(self):
+        return ModelChangeQuerySet(self.model, using=self._db)
+
+    # < django 1.6
+    get_query_set = get_queryset
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not hasattr(ModelChangeQuerySet, name):
+            raise AttributeError(name)
+        return getattr(self.get_queryset(), name)
+
+
 @python_2_unicode_compatible
 class ModelChange(BaseAuditModel):
     # original model
-    model_type = models.ForeignKey(ContentType, related_name='+')
+    model_type = models.ForeignKey(ContentType, related_name='+', db_constraint=False)
     model_pk = models.PositiveIntegerField()
     model = GenericForeignKey('model_type', 'model_pk')
 
@@ -41,11 +149,24 @@ class ModelChange(BaseAuditModel):
     action = models.CharField(max_length=6, choices=zip(_ACTIONS, _ACTIONS), blank=False, null=False)
     pre_change_state = JSONField(blank=True, null=True)
     changes = JSONField(blank=True, null=True)
+    # pre_change_state only has the old values of the changed fields, see the COMPACT_STORAGE setting. Also
+    # set on LINK and UNLINK changes, which have no state, so they are never taken as a checkpoint to replay from
+    compact = models.BooleanField(default=False)
+    # see the HASH_CHAIN setting and auditlog.chain
+    chain_hash = models.CharField(max_length=64, blank=True, null=True, editable=False)
+
+    objects = ModelChangeQuerySet.as_manager() if hasattr(QuerySet, 'as_manager') else ModelChangeManager()
 
     class Meta(BaseAuditModel.Meta):
         permissions = (
             ("can_view", "Can view audit model changes and requests"),
         )
+        index_together = (
+            # history of an object
+            ('model_type', 'model_pk', 'timestamp'),
+            # changes by a user
+            ('user', 'timestamp'),
+        )
 
     def __str__(self):
         return "{action} -- {timestamp} [{model_type} {model_pk}]".format(
@@ -57,14 +178,57 @@ class ModelChange(BaseAuditModel):
 
     @property
     def post_change_state(self):
-        post_change_state = self.pre_change_state or {}
+        if self.compact and self.pk is not None:
+            return self.reconstruct_state()
+        post_change_state = dict(self.pre_change_state or {})
         post_change_state.update(self.changes or {})
         return post_change_state
 
+    def reconstruct_state(self):
+        """ the full state of the object right after this change, which queries for compact changes """
+        if not self.compact:
+            return apply_change(self.pre_change_state, self)
+        return ModelChange.objects.replay(self.model_type_id, self.model_pk, self.timestamp, last=self)
+
     @property
     def fields_changed(self):
-        # there is probably a qay to do this in SQL and even index it because postgres is cool
-        # but I don't know how to do that
+        # to search by changed field in SQL, see FieldChange and ModelChange.objects.field_changed
         return self.changes.keys()
 
-    # TODO: probably a custom manager that lets you do some nicer searches wrt what changed
+    def get_field_changes(self):
+        """ unsaved FieldChange objects for the fields an update changed, the change must be saved """
+        if self.action != 'UPDATE' or not self.changes:
+            return []
+        return [
+            FieldChange(change_id=self.pk, model_type_id=self.model_type_id, field_name=field_name,
+                        timestamp=self.timestamp)
+            for field_name in self.changes
+        ]
+
+
+class FieldChange(models.Model):
+    """
+    one row for each field changed by an update, written along with the ModelChange when the
+    INDEX_CHANGED_FIELDS setting is on, so changes to a field can be found with an index
+    """
+    # without a constraint, a partitioned ModelChange table has no primary key on id alone to reference
+    change = models.ForeignKey(ModelChange, related_name='field_changes', db_constraint=False)
+    model_type = models.ForeignKey(ContentType, related_name='+', db_constraint=False)
+    field_name = models.CharField(max_length=255)
+    timestamp = models.DateTimeField(db_index=True)
+
+    class Meta:
+        index_together = (
+            ('field_name', 'timestamp'),
+            ('model_type', 'field_name', 'timestamp'),
+        )
+
+
+class HashChainHead(models.Model):
+    """ the start and end of the hash chain of each model type (see auditlog.chain) """
+    model_type = models.OneToOneField(ContentType, related_name='+', db_constraint=False)
+    # the hash of the newest change
+    hash = models.CharField(max_length=64)
+    # the chain holds the changes with a pk above start_pk (None: all of them), the first following start_hash
+    start_pk = models.IntegerField(blank=True, null=True)
+    start_hash = models.CharField(max_length=64, blank=True, default='')
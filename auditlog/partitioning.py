@@ -0,0 +1,189 @@
+"""
+Monthly range partitioning of the ModelChange table on timestamp, for PostgreSQL 11+
+
+convert_table turns an existing table into a partitioned one (rewriting it, so run it during
+maintenance), after which create_partitions should run regularly (see the auditlog_partitions command)
+to add partitions ahead of time. Rows outside of every monthly partition land in a default partition
+and are moved to their own partition when it is created.
+
+Expired partitions can then be detached and dropped as a whole, see the auditlog_retention command.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import re
+from collections import namedtuple
+from datetime import datetime
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import ModelChange
+
+
+Partition = namedtuple('Partition', ['name', 'start', 'end'])
+
+
+def get_connection(using=None):
+    return connections[using or router.db_for_write(ModelChange)]
+
+
+def supports_partitioning(connection):
+    return connection.vendor == 'postgresql' and connection.pg_version >= 110000
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def partition_name(start):
+    return '{}_p{:%Y%m}'.format(ModelChange._meta.db_table, start)
+
+
+def is_partitioned(using=None):
+    connection = get_connection(using)
+    if not supports_partitioning(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [connection.ops.quote_name(ModelChange._meta.db_table)],
+        )
+        return cursor.fetchone() is not None
+
+
+def get_partitions(using=None):
+    """ the monthly partitions of the table, oldest first """
+    connection = get_connection(using)
+    table = ModelChange._meta.db_table
+    pattern = re.compile(r'^{}_p(\d{{4}})(\d{{2}})$'.format(re.escape(table)))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [connection.ops.quote_name(table)],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+            partitions.append(Partition(name, start, add_months(start, 1)))
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+def create_partitions(months_ahead=3, using=None, start=None):
+    """
+    make sure there are partitions from the month of `start` (default: now) until months_ahead months
+    later, returns the names of the partitions created
+    """
+    connection = get_connection(using)
+    quote = connection.ops.quote_name
+    table = ModelChange._meta.db_table
+    default_name = '{}_default'.format(table)
+    existing = set(partition.start for partition in get_partitions(using))
+    first = month_start(start or timezone.now())
+
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [quote(default_name)])
+        has_default = cursor.fetchone()[0]
+        for months in range(months_ahead + 1):
+            start = add_months(first, months)
+            if start in existing:
+                continue
+            end = add_months(start, 1)
+            name = partition_name(start)
+            # built separately and attached so rows of the month can be moved out of the default partition
+            cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)'.format(quote(name), quote(table)))
+            if has_default:
+                cursor.execute(
+                    'WITH moved AS (DELETE FROM {default} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                    'INSERT INTO {partition} SELECT * FROM moved'.format(
+                        default=quote(default_name), partition=quote(name)),
+                    [start, end],
+                )
+            cursor.execute('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)'.format(
+                quote(table), quote(name)), [start, end])
+            created.append(name)
+    return created
+
+
+def convert_table(months_ahead=3, using=None):
+    """
+    rebuild the ModelChange table as a partitioned table, keeping its rows, indexes and foreign keys.
+    The primary key becomes (id, timestamp) as the partition key has to be part of it.
+    """
+    connection = get_connection(using)
+    quote = connection.ops.quote_name
+    table = ModelChange._meta.db_table
+    old_table = '{}_unpartitioned'.format(table)
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE'.format(quote(table)))
+        # django's foreign keys are deferred, pending checks on the old table would keep it from being dropped
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))",
+            [table, quote(table)],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [quote(table)],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id'), min(\"timestamp\") FROM {}".format(quote(table)),
+            [quote(table)],
+        )
+        sequence, oldest = cursor.fetchone()
+
+        cursor.execute('ALTER TABLE {} RENAME TO {}'.format(quote(table), quote(old_table)))
+        cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'.format(
+            quote(table), quote(old_table)))
+        cursor.execute('CREATE TABLE {} PARTITION OF {} DEFAULT'.format(
+            quote('{}_default'.format(table)), quote(table)))
+
+        # partitions for every month with rows, the copy goes straight into them
+        now = timezone.now()
+        first = month_start(oldest or now)
+        months = (now.year - first.year) * 12 + now.month - first.month + months_ahead
+        create_partitions(months_ahead=months, using=connection.alias, start=first)
+        cursor.execute('INSERT INTO {} SELECT * FROM {}'.format(quote(table), quote(old_table)))
+
+        if sequence:
+            cursor.execute('ALTER SEQUENCE {} OWNED BY {}.{}'.format(sequence, quote(table), quote('id')))
+        cursor.execute('DROP TABLE {}'.format(quote(old_table)))
+
+        # the old names are free again, indexes and keys are created on every partition from here
+        cursor.execute('ALTER TABLE {} ADD PRIMARY KEY ({}, {})'.format(
+            quote(table), quote('id'), quote('timestamp')))
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(quote(table), quote(name), definition))
+
+
+def detach_partition(partition, using=None):
+    connection = get_connection(using)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE {} DETACH PARTITION {}'.format(
+            quote(ModelChange._meta.db_table), quote(partition.name)))
+
+
+def drop_partition(partition, using=None):
+    """ detach and drop a partition, with all of its rows """
+    connection = get_connection(using)
+    with transaction.atomic(using=connection.alias):
+        detach_partition(partition, using=connection.alias)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE {}'.format(connection.ops.quote_name(partition.name)))
@@ -0,0 +1,61 @@
+"""
+Keeping the audit log in a database of its own, named by the DATABASE setting:
+
+    DATABASES = {'default': {...}, 'audit': {...}}
+    DATABASE_ROUTERS = ['auditlog.routers.AuditRouter']
+    AUDIT_SETTINGS = {'DATABASE': 'audit'}
+
+and `manage.py migrate --database=audit` to create the tables there. Only the audit app's models are
+routed, content types and users stay in their own database and the audit tables refer to them without
+foreign key constraints.
+
+Changes are then written on the audit database's connection once the transaction they were made in has
+committed, and not at all if it's rolled back (django 1.9+, older versions write them immediately).
+WRITE_MODE 'immediate' buffers them like 'buffered' does: the changes of a transaction are written
+together when it commits, those made outside of one at the end of the request.
+"""
+from __future__ import unicode_literals, absolute_import
+
+from django.db import router
+from django.utils import six
+
+from .default_settings import settings as audit_settings
+
+
+class AuditRouter(object):
+    def is_audit_model(self, model):
+        return model._meta.app_label == audit_settings.APP_LABEL
+
+    def db_for_read(self, model, **hints):
+        return self.get_database(model, router.db_for_read, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.get_database(model, router.db_for_write, hints)
+
+    def get_database(self, model, route, hints):
+        if not audit_settings.DATABASE:
+            return None
+        if self.is_audit_model(model):
+            return audit_settings.DATABASE
+        instance = hints.get('instance')
+        if instance is not None and self.is_audit_model(instance.__class__):
+            # the users and content types of audit rows, django would look for them in the audit database
+            return route(model)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # audit rows refer to users and content types in other databases
+        if audit_settings.DATABASE and (self.is_audit_model(obj1.__class__) or self.is_audit_model(obj2.__class__)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        database = audit_settings.DATABASE
+        if not database:
+            return None
+        if not isinstance(app_label, six.string_types):
+            # django 1.7 passes the model
+            app_label = app_label._meta.app_label
+        if app_label == audit_settings.APP_LABEL:
+            return db == database
+        return None
@@ -0,0 +1,93 @@
+"""
+Which requests AuditMiddleware logs (see the audit_request signal), so request logging can stay on under
+production traffic
+
+A request is logged with the probability of the first of these rules that applies: REQUEST_SAMPLE_STATUS
+by response status, REQUEST_SAMPLE_USERS by username, REQUEST_SAMPLE_PATHS by the longest matching path
+prefix, and REQUEST_SAMPLE_RATE otherwise. Sampled requests are then limited to REQUEST_RATE_LIMIT a
+second by a token bucket holding up to REQUEST_RATE_BURST, for each process.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import random
+import threading
+import time
+
+from .default_settings import settings as audit_settings
+
+
+class TokenBucket(object):
+    """ allows `rate` takes a second on average, and up to `burst` at once """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RequestSampler(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        # ((rate limit, burst), TokenBucket)
+        self.bucket = (None, None)
+        self.reset_counters()
+
+    def reset_counters(self):
+        with self.lock:
+            # logged, left out by sampling, left out by the rate limit
+            self.sampled = self.skipped = self.rate_limited = 0
+
+    def counters(self):
+        with self.lock:
+            return {'sampled': self.sampled, 'skipped': self.skipped, 'rate_limited': self.rate_limited}
+
+    def get_rate(self, request, status_code=None):
+        """ the probability of logging a request, see the module docstring """
+        if status_code is not None and audit_settings.REQUEST_SAMPLE_STATUS:
+            rates = audit_settings.REQUEST_SAMPLE_STATUS
+            for key in (status_code, '{}xx'.format(status_code // 100)):
+                if key in rates:
+                    return rates[key]
+        if audit_settings.REQUEST_SAMPLE_USERS:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated():
+                rate = audit_settings.REQUEST_SAMPLE_USERS.get(user.get_username())
+                if rate is not None:
+                    return rate
+        if audit_settings.REQUEST_SAMPLE_PATHS:
+            matches = [prefix for prefix in audit_settings.REQUEST_SAMPLE_PATHS if request.path.startswith(prefix)]
+            if matches:
+                return audit_settings.REQUEST_SAMPLE_PATHS[max(matches, key=len)]
+        return audit_settings.REQUEST_SAMPLE_RATE
+
+    def get_bucket(self):
+        limit = (audit_settings.REQUEST_RATE_LIMIT, audit_settings.REQUEST_RATE_BURST)
+        if self.bucket[0] != limit:
+            self.bucket = (limit, TokenBucket(*limit) if limit[0] is not None else None)
+        return self.bucket[1]
+
+    def decide(self, request, status_code=None):
+        """ whether to log a request, counted in the counters """
+        rate = self.get_rate(request, status_code)
+        if rate < 1 and random.random() >= rate:
+            outcome = 'skipped'
+        else:
+            bucket = self.get_bucket()
+            outcome = 'sampled' if bucket is None or bucket.take() else 'rate_limited'
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+        return outcome == 'sampled'
+
+
+request_sampler = RequestSampler()
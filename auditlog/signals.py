@@ -2,3 +2,7 @@ from django.dispatch import Signal
 
 
 audit_presave = Signal(providing_args=['model_instance', 'audit_meta'])
+
+# a request through AuditMiddleware was logged, `record` has its method, path, status_code, duration (seconds),
+# timestamp and user, remote_addr and remote_host when known. See the REQUEST_LOGGING setting
+audit_request = Signal(providing_args=['request', 'response', 'record'])
@@ -0,0 +1,171 @@
+"""
+Where ModelChange objects go once they are made, configured with the SINKS setting, a list of
+{'BACKEND': dotted path, 'OPTIONS': keyword arguments} dicts like django's CACHES. Every change is
+written to each of them:
+
+    AUDIT_SETTINGS = {
+        'SINKS': [
+            {'BACKEND': 'auditlog.sinks.DatabaseSink', 'OPTIONS': {'using': 'audit'}},
+            {'BACKEND': 'auditlog.sinks.FileSink', 'OPTIONS': {'path': '/var/log/audit.jsonl'}},
+        ],
+    }
+
+A sink is any class with a write(changes, using=None) method, `using` being the database the changes
+were made in, whose transaction decides if they happened. The sinks listed after a DatabaseSink are handed
+the changes by it once they are saved, so they have their ids and chain hashes.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import io
+import os
+import threading
+import time
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.utils.module_loading import import_string
+
+from . import encoding
+from .archive import change_to_dict
+from .buffer import change_buffer, write_changes
+from .default_settings import settings as audit_settings
+from .models import ModelChange
+from .writer import async_writer
+
+
+class DatabaseSink(object):
+    """
+    saves the changes as ModelChange rows according to the WRITE_MODE setting, to the database `using` or
+    the one the routers pick. Changes written to another database than they were made in are buffered in
+    'immediate' mode too
+    """
+    def __init__(self, using=None):
+        self.using = using
+        # the sinks given the changes once they are saved, see get_sinks
+        self.followers = []
+
+    def write(self, changes, using=None):
+        write_mode = audit_settings.WRITE_MODE
+        if write_mode == 'immediate' and self.get_database() != (using or DEFAULT_DB_ALIAS):
+            # can't be part of the transaction on `using`, so they're held until it commits like 'buffered' does
+            write_mode = 'buffered'
+        if write_mode == 'buffered':
+            change_buffer.add(changes, self, using=using)
+        elif write_mode == 'async':
+            async_writer.add(changes, self, using=using)
+        else:
+            self.save(changes, using=using)
+
+    def get_database(self):
+        return self.using or router.db_for_write(ModelChange)
+
+    def save(self, changes, using=None):
+        """ write the changes, then hand them to the followers """
+        write_changes(changes, using=self.using, with_pks=bool(self.followers))
+        for sink in self.followers:
+            sink.write(changes, using=using)
+
+
+class FileSink(object):
+    """
+    appends the changes to a file as JSON lines once their transaction commits (immediately before django
+    1.9). The file is synced to disk at most every fsync_interval seconds (0: after every write, None: never). With max_bytes it's rotated
+    like logging's RotatingFileHandler, keeping backup_count old files, which is only safe with a single
+    process writing to the path.
+    """
+    def __init__(self, path, max_bytes=None, backup_count=5, fsync_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fsync_interval = fsync_interval
+        self.file = None
+        self.last_fsync = 0
+        self.lock = threading.Lock()
+
+    def write(self, changes, using=None):
+        connection = connections[using or DEFAULT_DB_ALIAS]
+        if connection.in_atomic_block and hasattr(transaction, 'on_commit'):
+            transaction.on_commit(lambda: self.append(changes), using=connection.alias)
+        else:
+            self.append(changes)
+
+    def append(self, changes):
+        data = ''.join(encoding.dumps(change_to_dict(change)) + '\n' for change in changes).encode('utf-8')
+        with self.lock:
+            if self.file is None:
+                self.file = io.open(self.path, 'ab')
+            # a single write, so lines from several processes appending to the file don't interleave
+            self.file.write(data)
+            self.file.flush()
+            now = time.time()
+            if self.fsync_interval is not None and now - self.last_fsync >= self.fsync_interval:
+                os.fsync(self.file.fileno())
+                self.last_fsync = now
+            if self.max_bytes and self.file.tell() >= self.max_bytes:
+                self.rotate()
+
+    def rotate(self):
+        self.close_file()
+        for number in range(self.backup_count - 1, 0, -1):
+            source = '{}.{}'.format(self.path, number)
+            if os.path.exists(source):
+                os.rename(source, '{}.{}'.format(self.path, number + 1))
+        if self.backup_count:
+            os.rename(self.path, '{}.1'.format(self.path))
+        else:
+            os.remove(self.path)
+
+    def close_file(self):
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        with self.lock:
+            self.close_file()
+
+
+class MemorySink(object):
+    """ keeps the changes in a list, for tests. They're added immediately, whether the transaction commits or not """
+    def __init__(self):
+        self.changes = []
+
+    def write(self, changes, using=None):
+        self.changes.extend(changes)
+
+    def clear(self):
+        del self.changes[:]
+
+
+_sinks = {'config': None, 'sinks': [], 'first': []}
+_lock = threading.Lock()
+
+
+def _load_sinks(config):
+    sinks = [import_string(sink['BACKEND'])(**sink.get('OPTIONS', {})) for sink in config]
+    # other sinks follow the DatabaseSink listed before them
+    first = []
+    leader = None
+    for sink in sinks:
+        if isinstance(sink, DatabaseSink):
+            leader = sink
+            first.append(sink)
+        elif leader is not None:
+            leader.followers.append(sink)
+        else:
+            first.append(sink)
+    _sinks['sinks'] = sinks
+    _sinks['first'] = first
+    _sinks['config'] = config
+
+
+def get_sinks(first=False):
+    """
+    the sinks of the SINKS setting, made once for each value of the setting. With first only those that
+    aren't handed the changes by a DatabaseSink
+    """
+    config = audit_settings.SINKS
+    if _sinks['config'] is not config:
+        with _lock:
+            if _sinks['config'] is not config:
+                _load_sinks(config)
+    return _sinks['first' if first else 'sinks']
@@ -1,6 +1,29 @@
 from __future__ import unicode_literals
 import functools
-from .default_settings import settings
+from django.contrib.auth import get_user_model
+
+from .context import disabled_scopes
+
+
+def get_content_type(label):
+    """ the ContentType of a model given as app_label.model_name, ValueError if there's no such model """
+    # imported here, disable_audit can be imported before the apps are loaded
+    from django.contrib.contenttypes.models import ContentType
+    try:
+        app_label, model = label.lower().split('.')
+        return ContentType.objects.get_by_natural_key(app_label, model)
+    except ContentType.DoesNotExist:
+        raise ValueError(label)
+
+
+def get_user_ids(value):
+    """ the ids of the users with a username or id """
+    if value.isdigit():
+        return [int(value)]
+    # looked up separately, users may be in another database than the audit log
+    user_model = get_user_model()
+    return list(user_model._default_manager.filter(
+        **{user_model.USERNAME_FIELD: value}).values_list('pk', flat=True))
 
 
 def get_dict(obj):
@@ -13,8 +36,24 @@ def get_dict(obj):
 
 
 class DisableAuditContextManager(object):
-    """ dual-purpose decorator and context manager """
-    def __call__(self, func):
+    """
+    dual-purpose decorator and context manager that disables change logging in the current thread or
+    asyncio task only, and can be nested. Without models or actions it disables AuditMiddleware's request
+    logging too. Call it to disable only some models or actions:
+
+        with disable_audit(models=[SomeModel], actions=['UPDATE', 'DELETE']):
+            ...
+    """
+    def __init__(self, models=None, actions=None):
+        self.scope = (
+            tuple(models) if models is not None else None,
+            tuple(actions) if actions is not None else None,
+        )
+
+    def __call__(self, func=None, models=None, actions=None):
+        if func is None:
+            return DisableAuditContextManager(models=models, actions=actions)
+
         @functools.wraps(func)
         def decorated_func(*args, **kwargs):
             with self:
@@ -22,10 +61,13 @@ class DisableAuditContextManager(object):
         return decorated_func
 
     def __enter__(self):
-        settings.alter_settings(CHANGE_LOGGING=False, REQUEST_LOGGING=False)
+        disabled_scopes.set(disabled_scopes.get() + (self.scope,))
 
-    def __exit__(self,*args):
-        settings.reset()
+    def __exit__(self, *args):
+        # the same manager can be entered again inside the block, the innermost entry is left first
+        scopes = list(disabled_scopes.get())
+        del scopes[len(scopes) - 1 - scopes[::-1].index(self.scope)]
+        disabled_scopes.set(tuple(scopes))
 
 
 disable_audit = DisableAuditContextManager()
@@ -1,5 +1,7 @@
+from __future__ import unicode_literals
+
+from .context import get_request_attribution, request_attribution
 from .default_settings import settings
-from . import signals
 
 
 class DRFViewMixin(object):
@@ -7,23 +9,16 @@ class DRFViewMixin(object):
     info from the request
     """
 
+    def dispatch(self, request, *args, **kwargs):
+        # whatever initial() attributes changes to is undone here, even if an exception gets out of the view
+        token = request_attribution.set(request_attribution.get())
+        try:
+            return super(DRFViewMixin, self).dispatch(request, *args, **kwargs)
+        finally:
+            request_attribution.reset(token)
+
     def initial(self, request, *args, **kwargs):
         super(DRFViewMixin, self).initial(request, *args, **kwargs)
         # at this point, DRF should have performed auth and updated the request
-
-        def handler(sender, model_instance, audit_meta, **kwargs):
-            update_kwargs = {
-                'user': request.user,
-            }
-            if request.META.get('REMOTE_ADDR'):
-                update_kwargs['remote_addr'] = request.META.get('REMOTE_ADDR')
-            if request.META.get('REMOTE_HOST'):
-                update_kwargs['remote_host'] = request.META.get('REMOTE_HOST')
-            audit_meta.update_additional_kwargs(update_kwargs)
-
-        request._view_audit_handler = handler
-        signals.audit_presave.connect(request._view_audit_handler, dispatch_uid=(settings.DISPATCH_UID + 'drf', request))
-
-    def finalize_response(self, request, response, *args, **kwargs):
-        signals.audit_presave.disconnect(dispatch_uid=(settings.DISPATCH_UID + 'drf', request))
-        return super(DRFViewMixin, self).finalize_response(request, response, *args, **kwargs)
+        if settings.CHANGE_LOGGING:
+            request_attribution.set(get_request_attribution(request))
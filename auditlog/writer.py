@@ -0,0 +1,140 @@
+"""
+Background writing of ModelChange rows, used when the WRITE_MODE setting is 'async'
+
+Changes are put on a bounded queue once the transaction they were made in commits (django 1.9+, older
+versions write changes made in a transaction immediately) and worker threads write them in batches of
+up to ASYNC_BATCH_SIZE, waiting at most ASYNC_FLUSH_INTERVAL seconds for a batch to fill up.
+
+When the queue is full ASYNC_OVERFLOW decides what happens: 'block' waits for room, 'write' saves the
+changes in the calling thread and 'drop' discards them (counted in AsyncWriter.dropped).
+Whatever is queued is written before the process exits.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import atexit
+import logging
+import os
+import threading
+import time
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.utils.six.moves import queue
+
+from .default_settings import settings as audit_settings
+
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AsyncWriter(object):
+    def __init__(self):
+        self.queue = None
+        self.threads = []
+        self.dropped = 0
+        self.pid = None
+        self.lock = threading.Lock()
+        self.exit_handler_registered = False
+
+    def add(self, changes, sink, using=None):
+        """
+        queue ModelChange objects for changes made to instances in the database `using`, to be saved with
+        sink.save (see auditlog.sinks.DatabaseSink)
+        """
+        connection = connections[using or DEFAULT_DB_ALIAS]
+        if not connection.in_atomic_block:
+            self.put(changes, sink)
+        elif hasattr(transaction, 'on_commit'):
+            transaction.on_commit(lambda: self.put(changes, sink), using=connection.alias)
+        else:
+            # no way to tell if the transaction commits, so write them as part of it
+            sink.save(changes, using=using)
+
+    def put(self, changes, sink):
+        self.start()
+        overflow = audit_settings.ASYNC_OVERFLOW
+        for index, change in enumerate(changes):
+            try:
+                self.queue.put((sink, change), block=overflow == 'block')
+            except queue.Full:
+                if overflow == 'drop':
+                    with self.lock:
+                        self.dropped += len(changes) - index
+                    logger.warning('audit queue is full, dropped %d changes', len(changes) - index)
+                else:
+                    sink.save(changes[index:])
+                return
+
+    def start(self):
+        if self.threads and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.threads and self.pid == os.getpid():
+                return
+            # a forked process doesn't inherit the threads, start over with a new queue
+            self.pid = os.getpid()
+            self.queue = queue.Queue(maxsize=audit_settings.ASYNC_QUEUE_SIZE)
+            self.threads = []
+            for number in range(audit_settings.ASYNC_WORKERS):
+                thread = threading.Thread(target=self.run, name='auditlog-writer-%d' % number)
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+            if not self.exit_handler_registered:
+                atexit.register(self.stop)
+                self.exit_handler_registered = True
+
+    def run(self):
+        batch_size = audit_settings.ASYNC_BATCH_SIZE
+        flush_interval = audit_settings.ASYNC_FLUSH_INTERVAL
+        work_queue = self.queue
+        stopping = False
+        while not stopping:
+            batch = []
+            item = work_queue.get()
+            deadline = time.time() + flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                remaining = deadline - time.time()
+                if len(batch) >= batch_size or remaining <= 0:
+                    break
+                try:
+                    item = work_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            # (sink, change) pairs, nearly always all for the same sink
+            by_sink = {}
+            for sink, change in batch:
+                by_sink.setdefault(sink, []).append(change)
+            try:
+                for sink, changes in by_sink.items():
+                    sink.save(changes)
+            except Exception:
+                logger.exception('failed to write %d audit changes', len(batch))
+            finally:
+                close_old_connections()
+                for _ in range(len(batch) + stopping):
+                    work_queue.task_done()
+
+    def flush(self):
+        """ wait until every queued change has been written """
+        if self.threads and self.pid == os.getpid():
+            self.queue.join()
+
+    def stop(self, timeout=None):
+        """ write whatever is queued and stop the worker threads """
+        with self.lock:
+            threads, self.threads = self.threads, []
+            if not threads or self.pid != os.getpid():
+                return
+            for _ in threads:
+                self.queue.put(_STOP)
+            for thread in threads:
+                thread.join(timeout)
+
+
+async_writer = AsyncWriter()
@@ -12,6 +12,7 @@ setup(
     author_email='derek@derekleverenz.com',
     license='BSD',
     packages=find_packages(exclude=['testproject']),
+    package_data={'auditlog': ['templates/admin/auditlog/*.html']},
     install_requires=['Django>=1.5', 'jsonfield>=0.9.15'],
     zip_safe=True,
 )
@@ -0,0 +1,232 @@
+"""
+microbenchmarks for the audit log, run against a throwaway test database
+
+    python manage.py auditbench [benchmark ...] [--number N] [--rows N] [--queries N] [--threads N] [--requests N]
+"""
+from __future__ import print_function, unicode_literals
+
+import random
+import threading
+import time
+import timeit
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.forms.models import model_to_dict
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from auditlog import signals
+from auditlog.audit import AuditLog
+from auditlog.default_settings import settings as audit_settings
+from auditlog.models import ModelChange
+from auditlog.view_audit import DRFViewMixin
+from testapp import models
+
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def print_result(label, seconds):
+    print('  {:<48} {:>10.2f} us'.format(label, seconds * 1e6))
+
+
+def report(label, func, number):
+    print_result(label, timeit.timeit(func, number=number) / number)
+
+
+@benchmark
+def descriptor(options):
+    """ audit_log access on a model and an instance, and building the ModelChange for a write """
+    number = options['number']
+    instance = models.TestModelOne.objects.create(field1='bench')
+    audit_log = getattr(models.TestModelOne, audit_settings.AUDIT_META_NAME).audit_log
+
+    # what the descriptor and create_change_object used to do
+    report('class access, content type lookup', lambda: AuditLog.Manager(
+        ContentType.objects.get_for_model(models.TestModelOne)), number)
+    report('instance access, content type lookup', lambda: AuditLog.Manager(
+        ContentType.objects.get_for_model(models.TestModelOne), instance), number)
+    report('change object, generic foreign key', lambda: ModelChange(
+        model=instance, action='UPDATE'), number)
+
+    report('class access, cached', lambda: models.TestModelOne.audit_log, number)
+    report('instance access, cached', lambda: instance.audit_log, number)
+    report('change object, cached model_type_id', lambda: ModelChange(
+        model_type_id=audit_log.get_model_type_id(models.TestModelOne), model_pk=instance.pk,
+        action='UPDATE'), number)
+
+
+def model_to_dict_diff(instance, pre_save):
+    """ how create_change_object used to find the changes """
+    changes = {}
+    for field_name, new_value in model_to_dict(instance).items():
+        if pre_save.get(field_name) != new_value:
+            changes[field_name] = new_value
+    return changes
+
+
+@benchmark
+def extractor(options):
+    """ reading and diffing the fields of a 121 field model with model_to_dict and with its FieldExtractor """
+    number = options['number']
+    instance = models.WideModel.objects.create()
+    field_extractor = getattr(models.WideModel, audit_settings.AUDIT_META_NAME).audit_log.get_extractor(
+        models.WideModel)
+    pre_save = model_to_dict(instance)
+    pre_save_values = field_extractor.values(instance)
+    instance.field42 = 1
+
+    report('model_to_dict', lambda: model_to_dict(instance), number)
+    report('model_to_dict and diff', lambda: model_to_dict_diff(instance, pre_save), number)
+    report('extractor values', lambda: field_extractor.values(instance), number)
+    report('extractor values and diff', lambda: field_extractor.diff(
+        pre_save_values, field_extractor.values(instance)), number)
+    report('save, including the database', lambda: instance.save(), options['queries'])
+
+
+def create_synthetic_changes(rows, users):
+    """ rows of changes spread over a year, for 1/10th as many objects of each tracked test model """
+    model_type_ids = [ContentType.objects.get_for_model(model).pk
+                      for model in (models.TestModelOne, models.TestModelTwo, models.BulkModel)]
+    now = timezone.now()
+    batch = []
+    for number in range(rows):
+        batch.append(ModelChange(
+            model_type_id=random.choice(model_type_ids),
+            model_pk=random.randint(1, max(rows // 10, 1)),
+            user=random.choice(users),
+            timestamp=now - timedelta(seconds=random.randint(0, 365 * 24 * 3600)),
+            action='UPDATE',
+            changes={'field1': number},
+        ))
+        if len(batch) == 5000:
+            ModelChange.objects.bulk_create(batch)
+            batch = []
+    ModelChange.objects.bulk_create(batch)
+
+
+@benchmark
+def history(options):
+    """ history_for, latest_for and changes_between on a large ModelChange table, without and with indexes """
+    users = [User.objects.create(username='bench{}'.format(number)) for number in range(20)] + [None]
+    create_synthetic_changes(options['rows'], users)
+    number = options['queries']
+    instances = [models.TestModelOne(pk=random.randint(1, max(options['rows'] // 10, 1))) for _ in range(number)]
+    end = timezone.now() - timedelta(days=30)
+
+    def run(label):
+        lookups = iter(instances * 3)
+        report('history_for, ' + label, lambda: list(ModelChange.objects.history_for(next(lookups))), number)
+        report('latest_for, ' + label, lambda: ModelChange.objects.latest_for(next(lookups)), number)
+        report('changes_between for a user, ' + label, lambda: list(ModelChange.objects.changes_between(
+            end - timedelta(days=1), end, user=users[0])), number)
+
+    # sqlite's schema editor rebuilds the whole table to change indexes, the plain DROP/CREATE INDEX works
+    index_together = ModelChange._meta.index_together
+    with connection.schema_editor() as editor:
+        BaseDatabaseSchemaEditor.alter_index_together(editor, ModelChange, index_together, [])
+    run('no composite indexes')
+    with connection.schema_editor() as editor:
+        BaseDatabaseSchemaEditor.alter_index_together(editor, ModelChange, [], index_together)
+    run('composite indexes')
+
+
+class LegacyDRFViewMixin(object):
+    """ DRFViewMixin as it was, connecting an audit_presave receiver for every request """
+
+    def initial(self, request, *args, **kwargs):
+        super(LegacyDRFViewMixin, self).initial(request, *args, **kwargs)
+
+        def handler(sender, model_instance, audit_meta, **kwargs):
+            update_kwargs = {
+                'user': request.user,
+            }
+            if request.META.get('REMOTE_ADDR'):
+                update_kwargs['remote_addr'] = request.META.get('REMOTE_ADDR')
+            if request.META.get('REMOTE_HOST'):
+                update_kwargs['remote_host'] = request.META.get('REMOTE_HOST')
+            audit_meta.update_additional_kwargs(update_kwargs)
+
+        request._view_audit_handler = handler
+        signals.audit_presave.connect(request._view_audit_handler,
+                                      dispatch_uid=(audit_settings.DISPATCH_UID + 'drf', request))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        signals.audit_presave.disconnect(dispatch_uid=(audit_settings.DISPATCH_UID + 'drf', request))
+        return super(LegacyDRFViewMixin, self).finalize_response(request, response, *args, **kwargs)
+
+
+class PreSaveView(APIView):
+    """ runs the audit log's pre_save handling for a few new instances, without touching the database """
+    saves = 5
+
+    def post(self, request, *args, **kwargs):
+        audit_log = getattr(models.TestModelOne, audit_settings.AUDIT_META_NAME).audit_log
+        for _ in range(self.saves):
+            audit_log.pre_save_handler(models.TestModelOne, models.TestModelOne(field1='bench'))
+        return Response()
+
+
+@benchmark
+def drf(options):
+    """ DRF requests handled concurrently by threads, with the signal based and the context based mixin """
+    factory = APIRequestFactory()
+    user = User.objects.create(username='bench')
+
+    def run(label, view):
+        def handle_requests():
+            for _ in range(options['requests']):
+                request = factory.post('/', REMOTE_ADDR='127.0.0.1')
+                force_authenticate(request, user=user)
+                view(request)
+
+        threads = [threading.Thread(target=handle_requests) for _ in range(options['threads'])]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print_result('{}, per request'.format(label),
+                     (time.time() - start) / (options['threads'] * options['requests']))
+
+    run('signal receiver per request', type(str('LegacyView'), (LegacyDRFViewMixin, PreSaveView), {}).as_view())
+    run('request context', type(str('ContextView'), (DRFViewMixin, PreSaveView), {}).as_view())
+
+
+class Command(BaseCommand):
+    help = 'Runs audit log microbenchmarks: {}'.format(', '.join(BENCHMARKS))
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmarks', nargs='*')
+        parser.add_argument('--number', type=int, default=10000, help='iterations per measurement')
+        parser.add_argument('--rows', type=int, default=200000, help='size of synthetic tables')
+        parser.add_argument('--queries', type=int, default=200, help='iterations per database query measurement')
+        parser.add_argument('--threads', type=int, default=16, help='concurrent threads for load measurements')
+        parser.add_argument('--requests', type=int, default=500, help='requests made by each thread')
+
+    def handle(self, *args, **options):
+        names = options['benchmarks'] or list(BENCHMARKS)
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError('Unknown benchmarks: {}'.format(', '.join(sorted(unknown))))
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for name in names:
+                print('{}: {}'.format(name, BENCHMARKS[name].__doc__.strip()))
+                BENCHMARKS[name](options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -17,3 +17,49 @@ class TestModelOne(models.Model):
 class TestModelTwo(models.Model):
     field1 = models.CharField(max_length=20)
     tm1 = models.ForeignKey('TestModelOne')
+
+
+@audit.AuditLog.decorate(snapshot_on_load=True)
+class SnapshotModel(models.Model):
+    field1 = models.CharField(max_length=20)
+    field2 = models.CharField(max_length=20)
+
+
+@audit.AuditLog.decorate()
+class BulkModel(models.Model):
+    field1 = models.CharField(max_length=20)
+    field2 = models.IntegerField(default=0)
+
+    objects = audit.AuditManager()
+
+
+@audit.AuditLog.decorate(exclude=['secret'], ignore_only_changes_to=['last_seen'])
+class ConfiguredModel(models.Model):
+    field1 = models.CharField(max_length=20)
+    secret = models.CharField(max_length=20, blank=True)
+    last_seen = models.IntegerField(default=0)
+
+    objects = audit.AuditManager()
+
+
+@audit.AuditLog.decorate(fields=['field1'])
+class FieldsModel(models.Model):
+    field1 = models.CharField(max_length=20)
+    field2 = models.CharField(max_length=20, blank=True)
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=20)
+
+
+@audit.AuditLog.decorate()
+class TaggedModel(models.Model):
+    field1 = models.CharField(max_length=20)
+    tags = models.ManyToManyField(Tag, related_name='tagged')
+
+
+# 120 integer fields, for benchmarks of the audit log on wide tables
+WideModel = audit.AuditLog.decorate(snapshot_on_load=True)(type(str('WideModel'), (models.Model,), dict(
+    [('__module__', __name__)] +
+    [('field{}'.format(number), models.IntegerField(default=0)) for number in range(120)]
+)))
@@ -74,9 +74,23 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # an in memory database isn't shared between threads, which the async writer tests need
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    },
+    # for the tests of a dedicated audit database, see auditlog.routers
+    'audit': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'audit_db.sqlite3'),
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_audit_db.sqlite3'),
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['auditlog.routers.AuditRouter']
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.7/topics/i18n/
 
@@ -1,5 +1,9 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 
 
 class AuditBaseTestCase(TestCase):
     pass
+
+
+class AuditBaseTransactionTestCase(TransactionTestCase):
+    pass
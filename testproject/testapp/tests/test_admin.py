@@ -0,0 +1,101 @@
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from auditlog import admin as audit_admin
+from auditlog.default_settings import settings as audit_settings
+from auditlog.models import ModelChange
+from .base import AuditBaseTestCase
+from testapp import models
+
+
+class AuditAdminTest(AuditBaseTestCase):
+    """AuditAdmin Tests"""
+
+    def setUp(self):
+        super(AuditAdminTest, self).setUp()
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.user = User.objects.create(username='auditor')
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+        for value in range(5):
+            ModelChange.objects.create(model=self.tm1, action='UPDATE', user=self.user, changes={'field1': value})
+        self.client.login(username='admin', password='password')
+        self.url = reverse('admin:{}_modelchange_changelist'.format(ModelChange._meta.app_label))
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(AuditAdminTest, self).tearDown()
+
+    def changelist(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(200, response.status_code)
+        return response.context['cl']
+
+    def test_change_view(self):
+        change = ModelChange.objects.filter(action='UPDATE').first()
+        response = self.client.get(reverse('admin:{}_modelchange_change'.format(ModelChange._meta.app_label),
+                                           args=[change.pk]))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            set(['action', 'user', 'timestamp', 'remote_addr', 'remote_host', 'model_pk', 'model_type',
+                 'pre_change_state', 'changes']),
+            set(response.context['adminform'].readonly_fields))
+
+    def test_list_doesnt_load_payloads(self):
+        with CaptureQueriesContext(connection) as queries:
+            cl = self.changelist()
+        self.assertEqual(6, len(cl.result_list))
+        self.assertIn('changes', cl.result_list[0].get_deferred_fields())
+        select = [query['sql'] for query in queries.captured_queries
+                  if ModelChange._meta.db_table in query['sql'] and 'ORDER BY' in query['sql']][0]
+        self.assertNotIn('"changes"', select)
+        self.assertIn('auth_user', select)
+
+    def test_audit_database_loads_related_per_page(self):
+        # a database of its own for the audit log, here the same one
+        audit_settings.alter_settings(DATABASE='default')
+        with CaptureQueriesContext(connection) as queries:
+            cl = self.changelist()
+        self.assertEqual(6, len(cl.result_list))
+        captured = [query['sql'] for query in queries.captured_queries]
+        select = [sql for sql in captured if ModelChange._meta.db_table in sql and 'ORDER BY' in sql][0]
+        self.assertNotIn('auth_user', select)
+        self.assertEqual(1, len([sql for sql in captured if 'FROM "auth_user"' in sql and ' IN (' in sql]))
+        self.assertEqual(1, len([sql for sql in captured if 'FROM "django_content_type"' in sql and ' IN (' in sql]))
+
+    def test_large_table_pages_by_id(self):
+        audit_settings.alter_settings(ADMIN_LARGE_TABLE=True)
+        audit_admin.AuditAdmin.list_per_page, per_page = 4, audit_admin.AuditAdmin.list_per_page
+        try:
+            cl = self.changelist()
+            self.assertTrue(cl.keyset)
+            self.assertEqual(6, cl.result_count)
+            newest = list(ModelChange.objects.order_by('-pk'))
+            self.assertEqual(newest[:4], cl.result_list)
+            self.assertIsNone(cl.newest_url)
+
+            cl = self.changelist(before=newest[3].pk)
+            self.assertEqual(newest[4:], cl.result_list)
+            self.assertIsNone(cl.older_url)
+            self.assertIsNotNone(cl.newest_url)
+        finally:
+            audit_admin.AuditAdmin.list_per_page = per_page
+
+    def test_large_table_filters(self):
+        audit_settings.alter_settings(ADMIN_LARGE_TABLE=True)
+        self.assertEqual(5, len(self.changelist(user='auditor').result_list))
+        self.assertEqual(5, len(self.changelist(user=str(self.user.pk)).result_list))
+        self.assertEqual(6, len(self.changelist(model='testapp.testmodelone').result_list))
+        self.assertEqual(0, len(self.changelist(model='testapp.testmodeltwo').result_list))
+        response = self.client.get(self.url, {'model': 'testapp.missing'})
+        self.assertEqual(302, response.status_code)
+
+    def test_estimated_count(self):
+        audit_settings.alter_settings(ADMIN_LARGE_TABLE=True, ADMIN_EXACT_COUNT_LIMIT=0)
+        cl = self.changelist()
+        if connection.vendor == 'postgresql':
+            self.assertTrue(cl.count_estimated)
+        else:
+            self.assertFalse(cl.count_estimated)
+            self.assertEqual(6, cl.result_count)
@@ -0,0 +1,78 @@
+from unittest import skipUnless
+
+from django.db import transaction
+
+from auditlog.buffer import change_buffer
+from auditlog.default_settings import settings as audit_settings
+from auditlog.models import ModelChange
+from .base import AuditBaseTransactionTestCase
+from testapp import models
+
+
+class ChangeBufferTest(AuditBaseTransactionTestCase):
+    """Buffered Change Writing Tests"""
+
+    def setUp(self):
+        super(ChangeBufferTest, self).setUp()
+        audit_settings.alter_settings(WRITE_MODE='buffered')
+
+    def tearDown(self):
+        audit_settings.reset()
+        change_buffer.end_request()
+        super(ChangeBufferTest, self).tearDown()
+
+    def test_writes_immediately_outside_transaction_and_request(self):
+        models.TestModelOne.objects.create(field1='a')
+        self.assertEqual(1, ModelChange.objects.count())
+
+    def test_writes_at_end_of_request(self):
+        change_buffer.begin_request()
+        models.TestModelOne.objects.create(field1='a')
+        models.TestModelOne.objects.create(field1='b')
+        self.assertEqual(0, ModelChange.objects.count())
+        change_buffer.end_request()
+        self.assertEqual(2, ModelChange.objects.count())
+
+    def test_writes_when_buffer_is_full(self):
+        audit_settings.alter_settings(BUFFER_SIZE=2)
+        change_buffer.begin_request()
+        for value in ('a', 'b', 'c'):
+            models.TestModelOne.objects.create(field1=value)
+        self.assertEqual(2, ModelChange.objects.count())
+
+    @skipUnless(hasattr(transaction, 'on_commit'), 'requires transaction.on_commit')
+    def test_writes_on_commit(self):
+        with transaction.atomic():
+            models.TestModelOne.objects.create(field1='a')
+            models.TestModelOne.objects.create(field1='b')
+            self.assertEqual(0, ModelChange.objects.count())
+        self.assertEqual(2, ModelChange.objects.count())
+
+    @skipUnless(hasattr(transaction, 'on_commit'), 'requires transaction.on_commit')
+    def test_discards_on_rollback(self):
+        try:
+            with transaction.atomic():
+                models.TestModelOne.objects.create(field1='a')
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            models.TestModelOne.objects.create(field1='b')
+        self.assertEqual(1, ModelChange.objects.count())
+        self.assertEqual('b', ModelChange.objects.get().changes['field1'])
+
+    @skipUnless(hasattr(transaction, 'on_commit'), 'requires transaction.on_commit')
+    def test_discards_savepoint_rollback(self):
+        with transaction.atomic():
+            models.TestModelOne.objects.create(field1='a')
+            try:
+                with transaction.atomic():
+                    models.TestModelOne.objects.create(field1='b')
+                    raise ValueError
+            except ValueError:
+                pass
+            models.TestModelOne.objects.create(field1='c')
+        self.assertEqual(
+            ['a', 'c'],
+            sorted(change.changes['field1'] for change in ModelChange.objects.all()),
+        )
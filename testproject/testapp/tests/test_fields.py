@@ -0,0 +1,105 @@
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from django.core import serializers
+from django.db import connection
+
+from auditlog import compression, encoding
+from auditlog.default_settings import settings as audit_settings
+from auditlog.fields import EncodedJSON
+from auditlog.models import ModelChange
+from .base import AuditBaseTestCase
+from testapp import models
+
+
+def sorted_dumps(value):
+    return json.dumps(value, sort_keys=True, default=encoding.default)
+
+
+class JSONFieldTest(AuditBaseTestCase):
+    """ModelChange JSON field Tests"""
+
+    def setUp(self):
+        super(JSONFieldTest, self).setUp()
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(JSONFieldTest, self).tearDown()
+
+    def test_decoded_on_access(self):
+        if ModelChange._meta.get_field('changes').db_type(connection) == 'jsonb':
+            self.skipTest('psycopg2 decodes jsonb columns')
+        change = ModelChange.objects.get()
+        self.assertIsInstance(change.__dict__['changes'], EncodedJSON)
+        self.assertDictEqual({'id': self.tm1.pk, 'field1': 'a'}, change.changes)
+        self.assertIsInstance(change.__dict__['changes'], dict)
+        self.assertEqual(json.loads(ModelChange.objects.values_list('changes', flat=True)[0]), change.changes)
+
+    def test_round_trip(self):
+        change = ModelChange.objects.get()
+        change.changes = {'value': [1, 'b', None]}
+        change.save()
+        self.assertDictEqual({'value': [1, 'b', None]}, ModelChange.objects.get().changes)
+
+    def test_serialized(self):
+        data = json.loads(serializers.serialize('json', ModelChange.objects.all()))
+        self.assertDictEqual({'id': self.tm1.pk, 'field1': 'a'}, json.loads(data[0]['fields']['changes']))
+
+    def test_encodes_field_values(self):
+        value = {
+            'datetime': datetime(2015, 1, 2, 3, 4, 5),
+            'decimal': Decimal('1.50'),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+        }
+        self.assertDictEqual({
+            'datetime': '2015-01-02T03:04:05',
+            'decimal': '1.50',
+            'uuid': '12345678-1234-5678-1234-567812345678',
+        }, encoding.loads(encoding.dumps(value)))
+
+    def test_pluggable_encoder(self):
+        audit_settings.alter_settings(JSON_DUMPS='testapp.tests.test_fields.sorted_dumps')
+        self.assertEqual('{"a": 1, "b": 2}', encoding.dumps({'b': 2, 'a': 1}))
+
+    def test_native_storage(self):
+        audit_settings.alter_settings(JSON_STORAGE='native')
+        expected = 'jsonb' if connection.vendor == 'postgresql' else 'text'
+        self.assertEqual(expected, ModelChange._meta.get_field('changes').db_type(connection))
+
+
+class CompressionTest(AuditBaseTestCase):
+    """Payload compression Tests"""
+
+    def setUp(self):
+        super(CompressionTest, self).setUp()
+        audit_settings.alter_settings(COMPRESSION='zlib', COMPRESSION_THRESHOLD=100)
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(CompressionTest, self).tearDown()
+
+    def stored(self, change):
+        return ModelChange.objects.filter(pk=change.pk).values_list('changes', flat=True)[0]
+
+    def test_large_payloads_compressed(self):
+        change = ModelChange.objects.create(model=self.tm1, action='UPDATE', changes={'text': 'x' * 1000})
+        self.assertTrue(compression.is_compressed(self.stored(change)))
+        self.assertEqual({'text': 'x' * 1000}, ModelChange.objects.get(pk=change.pk).changes)
+
+    def test_small_payloads_not_compressed(self):
+        self.assertFalse(compression.is_compressed(self.stored(ModelChange.objects.get())))
+
+    def test_decompressed_on_access(self):
+        change = ModelChange.objects.create(model=self.tm1, action='UPDATE', changes={'text': 'y' * 1000},
+                                            pre_change_state={'text': 'x' * 1000})
+        change = ModelChange.objects.get(pk=change.pk)
+        self.assertIsInstance(change.__dict__['pre_change_state'], EncodedJSON)
+        self.assertEqual({'text': 'y' * 1000}, change.post_change_state)
+
+    def test_compress_round_trip(self):
+        text = '{"a":"%s"}' % ('\u00e9' * 50)
+        self.assertEqual(text, compression.decompress(compression.compress(text)))
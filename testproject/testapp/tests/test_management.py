@@ -0,0 +1,269 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from auditlog import compression, partitioning
+from auditlog.default_settings import settings as audit_settings
+from auditlog.models import ModelChange
+from .base import AuditBaseTestCase, AuditBaseTransactionTestCase
+from testapp import models
+
+
+class ManagementCommandTestCase(AuditBaseTestCase):
+    def setUp(self):
+        super(ManagementCommandTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+        now = timezone.now()
+        for days in (400, 100, 10):
+            ModelChange.objects.create(model=self.tm1, action='UPDATE', changes={'field1': days},
+                                       timestamp=now - timedelta(days=days))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(ManagementCommandTestCase, self).tearDown()
+
+    def call_command(self, *args, **kwargs):
+        call_command(*args, stdout=StringIO(), **kwargs)
+
+    def read_archive(self, name):
+        with gzip.open(os.path.join(self.directory, name)) as archive:
+            return [json.loads(line.decode('utf-8')) for line in archive]
+
+
+class RetentionCommandTest(ManagementCommandTestCase):
+    """auditlog_retention Command Tests"""
+
+    def test_requires_retention_period(self):
+        with self.assertRaises(CommandError):
+            self.call_command('auditlog_retention')
+
+    def test_deletes_expired_changes(self):
+        self.call_command('auditlog_retention', days=30)
+        self.assertEqual([10], sorted(change.changes['field1'] for change in
+                                      self.tm1.audit_log.filter(action='UPDATE')))
+        self.assertEqual(1, self.tm1.audit_log.filter(action='CREATE').count())
+
+    def test_archives_expired_changes(self):
+        self.call_command('auditlog_retention', days=30, archive_dir=self.directory, batch_size=1)
+        archives = os.listdir(self.directory)
+        self.assertEqual(1, len(archives))
+        rows = self.read_archive(archives[0])
+        self.assertEqual([400, 100], [row['changes']['field1'] for row in rows])
+        self.assertEqual(self.tm1.pk, rows[0]['model_pk'])
+
+
+class PartitionsCommandTest(ManagementCommandTestCase):
+    """auditlog_partitions Command Tests"""
+
+    def setUp(self):
+        if not partitioning.supports_partitioning(connection):
+            self.skipTest('requires PostgreSQL 11+')
+        super(PartitionsCommandTest, self).setUp()
+
+    def test_requires_partitioned_table(self):
+        with self.assertRaises(CommandError):
+            self.call_command('auditlog_partitions')
+
+    def test_convert(self):
+        self.call_command('auditlog_partitions', convert=True, months_ahead=2)
+        self.assertTrue(partitioning.is_partitioned())
+        partitions = partitioning.get_partitions()
+        # every month since the oldest change, and two ahead
+        self.assertEqual(partitioning.month_start(timezone.now() - timedelta(days=400)), partitions[0].start)
+        self.assertEqual(partitioning.add_months(partitioning.month_start(timezone.now()), 3), partitions[-1].end)
+        self.assertEqual(4, self.tm1.audit_log.count())
+        models.TestModelOne.objects.create(field1='b')
+        self.assertEqual(5, ModelChange.objects.count())
+
+    def test_creates_partitions_and_moves_rows_out_of_default(self):
+        self.call_command('auditlog_partitions', convert=True, months_ahead=0)
+        future = partitioning.add_months(partitioning.month_start(timezone.now()), 2)
+        ModelChange.objects.create(model=self.tm1, action='UPDATE', timestamp=future)
+        self.call_command('auditlog_partitions', months_ahead=2)
+        self.assertEqual(future, partitioning.get_partitions()[-1].start)
+        self.assertEqual(5, self.tm1.audit_log.count())
+
+    def test_retention_drops_partitions(self):
+        self.call_command('auditlog_partitions', convert=True)
+        self.call_command('auditlog_retention', days=30, archive_dir=self.directory)
+        self.assertEqual([10], sorted(change.changes['field1'] for change in
+                                      self.tm1.audit_log.filter(action='UPDATE')))
+        oldest = partitioning.get_partitions()[0]
+        self.assertGreater(oldest.end, timezone.now() - timedelta(days=30))
+        archived = [row['changes']['field1'] for name in sorted(os.listdir(self.directory))
+                    for row in self.read_archive(name)]
+        self.assertEqual([400, 100], archived)
+
+
+class RecompressCommandTest(ManagementCommandTestCase):
+    """auditlog_recompress Command Tests"""
+
+    def setUp(self):
+        super(RecompressCommandTest, self).setUp()
+        self.large = ModelChange.objects.create(model=self.tm1, action='UPDATE', changes={'field1': 'x' * 1000})
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(RecompressCommandTest, self).tearDown()
+
+    def is_compressed(self, change):
+        return compression.is_compressed(
+            ModelChange.objects.filter(pk=change.pk).values_list('changes', flat=True)[0])
+
+    def test_compresses_and_decompresses(self):
+        audit_settings.alter_settings(COMPRESSION='zlib', COMPRESSION_THRESHOLD=100)
+        self.call_command('auditlog_recompress', batch_size=2)
+        self.assertTrue(self.is_compressed(self.large))
+        self.assertFalse(self.is_compressed(self.tm1.audit_log.get(action='CREATE')))
+
+        audit_settings.alter_settings(COMPRESSION=None)
+        self.call_command('auditlog_recompress')
+        self.assertFalse(self.is_compressed(self.large))
+        self.assertEqual({'field1': 'x' * 1000}, ModelChange.objects.get(pk=self.large.pk).changes)
+
+    def test_start_after(self):
+        audit_settings.alter_settings(COMPRESSION='zlib', COMPRESSION_THRESHOLD=100)
+        self.call_command('auditlog_recompress', start_after=self.large.pk)
+        self.assertFalse(self.is_compressed(self.large))
+
+
+class ExportCommandTest(ManagementCommandTestCase):
+    """auditlog_export Command Tests"""
+
+    def setUp(self):
+        super(ExportCommandTest, self).setUp()
+        self.user = User.objects.create(username='auditor')
+        self.tm2 = models.TestModelTwo.objects.create(tm1=self.tm1)
+        self.by_user = ModelChange.objects.create(model=self.tm1, action='UPDATE', user=self.user,
+                                                  changes={'field1': 'c'})
+        self.path = os.path.join(self.directory, 'export.jsonl')
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(ExportCommandTest, self).tearDown()
+
+    def export(self, **kwargs):
+        call_command('auditlog_export', output=self.path, stdout=StringIO(), stderr=StringIO(), **kwargs)
+
+    def read_lines(self, opener=open):
+        with opener(self.path, 'rb') as export:
+            return [json.loads(line.decode('utf-8')) for line in export]
+
+    def test_exports_all_changes_in_batches(self):
+        self.export(batch_size=2)
+        lines = self.read_lines()
+        self.assertEqual(list(ModelChange.objects.order_by('pk').values_list('pk', flat=True)),
+                         [line['id'] for line in lines])
+        line = lines[-1]
+        self.assertEqual(self.by_user.pk, line['id'])
+        self.assertEqual('testapp.testmodelone', line['model'])
+        self.assertEqual('auditor', line['username'])
+        self.assertEqual({'field1': 'c'}, line['changes'])
+        self.assertEqual(self.tm1.pk, line['model_pk'])
+
+    def test_filters(self):
+        self.export(model=['testapp.TestModelTwo'])
+        self.assertEqual([self.tm2.pk], [line['model_pk'] for line in self.read_lines()])
+        self.export(user='auditor')
+        self.assertEqual([self.by_user.pk], [line['id'] for line in self.read_lines()])
+        self.export(user=str(self.user.pk), action=['create'])
+        self.assertEqual([], self.read_lines())
+
+        now = timezone.now()
+        self.export(since=(now - timedelta(days=200)).isoformat(), until=(now - timedelta(days=50)).isoformat())
+        self.assertEqual([{'field1': 100}], [line['changes'] for line in self.read_lines()])
+        self.export(until=(now - timedelta(days=300)).date().isoformat())
+        self.assertEqual([{'field1': 400}], [line['changes'] for line in self.read_lines()])
+
+    def test_unknown_model(self):
+        with self.assertRaises(CommandError):
+            self.export(model=['testapp.missing'])
+
+    def test_resume_appends_to_gzip(self):
+        self.export(gzip=True)
+        last = ModelChange.objects.order_by('pk').last()
+        ModelChange.objects.create(model=self.tm1, action='UPDATE', changes={'field1': 'd'})
+        self.export(gzip=True, start_after=last.pk)
+        self.assertEqual(list(ModelChange.objects.order_by('pk').values_list('pk', flat=True)),
+                         [line['id'] for line in self.read_lines(gzip.open)])
+
+    def test_compressed_payloads(self):
+        audit_settings.alter_settings(COMPRESSION='zlib', COMPRESSION_THRESHOLD=10)
+        ModelChange.objects.create(model=self.tm1, action='UPDATE', changes={'field1': 'x' * 100})
+        self.export(start_after=self.by_user.pk)
+        self.assertEqual([{'field1': 'x' * 100}], [line['changes'] for line in self.read_lines()])
+
+    def test_csv(self):
+        self.export(format='csv', user='auditor')
+        with open(self.path) as export:
+            rows = list(csv.reader(export))
+        self.assertEqual('id', rows[0][0])
+        self.assertEqual(2, len(rows))
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual('auditor', row['username'])
+        self.assertEqual({'field1': 'c'}, json.loads(row['changes']))
+
+
+class VerifyCommandTest(AuditBaseTransactionTestCase):
+    """auditlog_verify Command Tests"""
+
+    def setUp(self):
+        super(VerifyCommandTest, self).setUp()
+        audit_settings.alter_settings(HASH_CHAIN=True)
+        self.tm1 = tm1 = models.TestModelOne.objects.create(field1='a')
+        tm1.field1 = 'b'
+        tm1.save()
+        models.TestModelTwo.objects.create(tm1=tm1, field1='a')
+        models.BulkModel.objects.create(field1='a')
+        self.create = tm1.audit_log.get(action='CREATE')
+        self.update = tm1.audit_log.get(action='UPDATE')
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(VerifyCommandTest, self).tearDown()
+
+    def verify(self, **kwargs):
+        stdout = StringIO()
+        call_command('auditlog_verify', stdout=stdout, stderr=StringIO(), **kwargs)
+        return stdout.getvalue()
+
+    def test_verify(self):
+        self.assertIn('Checked 3 hash chains, 4 changes', self.verify())
+        self.assertIn('Checked 1 hash chains, 2 changes', self.verify(model=['testapp.testmodelone']))
+
+    def test_parallel(self):
+        self.assertIn('Checked 3 hash chains, 4 changes', self.verify(workers=2))
+
+    def test_broken(self):
+        ModelChange.objects.filter(pk=self.update.pk).update(changes={'field1': 'x'})
+        with self.assertRaises(CommandError):
+            self.verify()
+        self.verify(model=['testapp.testmodeltwo'])
+
+    def test_changed_first_row(self):
+        ModelChange.objects.filter(pk=self.create.pk).update(changes={'field1': 'x'})
+        with self.assertRaises(CommandError):
+            self.verify(model=['testapp.testmodelone'])
+
+    def test_inserted_row(self):
+        ModelChange.objects.create(model=self.tm1, action='UPDATE', changes={'field1': 'x'})
+        with self.assertRaises(CommandError):
+            self.verify(model=['testapp.testmodelone'])
+
+    def test_retention_moves_chain_start(self):
+        ModelChange.objects.filter(pk=self.create.pk).update(timestamp=timezone.now() - timedelta(days=10))
+        call_command('auditlog_retention', days=5, stdout=StringIO())
+        self.assertFalse(ModelChange.objects.filter(pk=self.create.pk).exists())
+        self.assertIn('Checked 3 hash chains, 3 changes', self.verify())
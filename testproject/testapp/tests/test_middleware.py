@@ -1,8 +1,15 @@
 from rest_framework.test import APIRequestFactory
 from django.db.models import signals
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpResponse
 
-from auditlog.signals import audit_presave
+import threading
+
+from auditlog.context import request_attribution
+from auditlog.default_settings import settings as audit_settings
+from auditlog.sampling import request_sampler
+from auditlog.signals import audit_presave, audit_request
+from auditlog.utils import disable_audit
 from auditlog.middleware import AuditMiddleware
 from .base import AuditBaseTestCase
 
@@ -34,8 +41,104 @@ class AuditMiddlewareTest(AuditBaseTestCase):
         self.audit_presave_count = len(audit_presave.receivers)
         self.predel_count = len(signals.pre_delete.receivers)
 
-    def test_cleans_up_signal_handlers_on_response(self):
+    def tearDown(self):
+        request_attribution.set(None)
+        super(AuditMiddlewareTest, self).tearDown()
+
+    def test_cleans_up_on_response(self):
         self.audit_middleware.process_response(self.request, None)
         self.assertEqual(self.presave_count, len(signals.pre_save.receivers))
         self.assertEqual(self.predel_count, len(signals.pre_delete.receivers))
-        self.assertEqual(self.audit_presave_count - 1, len(audit_presave.receivers))
+        self.assertEqual(self.audit_presave_count, len(audit_presave.receivers))
+        self.assertIsNone(request_attribution.get())
+
+    def test_attributes_changes_to_request(self):
+        self.tm2.field1 = 'efgh'
+        self.tm2.save()
+        change = self.tm2.audit_log.latest()
+        self.assertEqual(self.user2, change.user)
+        self.assertEqual('1.2.3.4', change.remote_addr)
+
+    def test_attribution_is_context_local(self):
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(request_attribution.get()))
+        thread.start()
+        thread.join()
+        self.assertEqual([None], seen)
+
+    def test_anonymous_user(self):
+        self.audit_middleware.process_response(self.request, None)
+        self.request.user = AnonymousUser()
+        self.audit_middleware.process_request(self.request)
+        self.assertEqual({'remote_addr': '1.2.3.4'}, request_attribution.get())
+
+
+class RequestLoggingTest(AuditBaseTestCase):
+    """request logging sampling Tests"""
+
+    def setUp(self):
+        super(RequestLoggingTest, self).setUp()
+        self.user = User.objects.create(username='test_user')
+        self.request_factory = APIRequestFactory()
+        self.audit_middleware = AuditMiddleware()
+        self.records = []
+        audit_request.connect(self.receiver)
+        request_sampler.reset_counters()
+
+    def tearDown(self):
+        audit_request.disconnect(self.receiver)
+        audit_settings.reset()
+        request_attribution.set(None)
+        super(RequestLoggingTest, self).tearDown()
+
+    def receiver(self, sender, request, response, record, **kwargs):
+        self.records.append(record)
+
+    def handle(self, path='/', status=200, user=None):
+        request = self.request_factory.get(path)
+        request.user = user or AnonymousUser()
+        self.audit_middleware.process_request(request)
+        self.audit_middleware.process_response(request, HttpResponse(status=status))
+
+    def test_logs_requests(self):
+        self.handle('/some/path/', user=self.user)
+        record = self.records[0]
+        self.assertEqual(('GET', '/some/path/', 200), (record['method'], record['path'], record['status_code']))
+        self.assertEqual(self.user, record['user'])
+        self.assertEqual({'sampled': 1, 'skipped': 0, 'rate_limited': 0}, request_sampler.counters())
+
+    def test_nothing_captured_without_receivers(self):
+        audit_request.disconnect(self.receiver)
+        request = self.request_factory.get('/')
+        self.audit_middleware.process_request(request)
+        self.assertFalse(hasattr(request, '_audit_request_log'))
+        self.assertEqual(0, request_sampler.counters()['sampled'])
+
+    def test_sampling_rules(self):
+        audit_settings.alter_settings(
+            REQUEST_SAMPLE_RATE=0, REQUEST_SAMPLE_PATHS={'/api/': 1, '/api/health/': 0},
+            REQUEST_SAMPLE_USERS={'test_user': 1}, REQUEST_SAMPLE_STATUS={'5xx': 1, 503: 0})
+        self.handle('/')
+        self.handle('/api/health/')
+        self.handle('/api/items/')
+        self.handle('/', user=self.user)
+        self.handle('/api/health/', status=500)
+        self.handle('/api/items/', status=503)
+        self.assertEqual([('/api/items/', 200), ('/', 200), ('/api/health/', 500)],
+                         [(record['path'], record['status_code']) for record in self.records])
+        self.assertEqual({'sampled': 3, 'skipped': 3, 'rate_limited': 0}, request_sampler.counters())
+
+    def test_rate_limit(self):
+        audit_settings.alter_settings(REQUEST_RATE_LIMIT=0.001, REQUEST_RATE_BURST=2)
+        for _ in range(5):
+            self.handle('/')
+        self.assertEqual(2, len(self.records))
+        self.assertEqual({'sampled': 2, 'skipped': 0, 'rate_limited': 3}, request_sampler.counters())
+
+    def test_disable_audit(self):
+        with disable_audit:
+            self.handle('/')
+        with disable_audit(actions=['UPDATE']):
+            self.handle('/scoped/')
+        self.assertEqual(['/scoped/'], [record['path'] for record in self.records])
+        self.assertEqual({'sampled': 1, 'skipped': 0, 'rate_limited': 0}, request_sampler.counters())
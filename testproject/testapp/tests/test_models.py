@@ -1,8 +1,20 @@
+from datetime import timedelta
+
 from django.forms.models import model_to_dict
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from auditlog.models import ModelChange
+from auditlog.default_settings import settings as audit_settings
+from auditlog.chain import move_chain_starts, verify_chain
+from auditlog.models import FieldChange, HashChainHead, ModelChange
 from auditlog.audit import AuditLog
+from auditlog.extractor import FieldExtractor
+from auditlog.history import StateCache
 from .base import AuditBaseTestCase
 from testapp import models
 
@@ -75,6 +87,15 @@ class AuditLogTest(AuditBaseTestCase):
         self.assertEqual(1, self.tm1.audit_log.count())
         self.assertEqual(1, models.TestModelOne.audit_log.count())
 
+    def test_manager_caches_model_type(self):
+        models.TestModelOne.audit_log.count()
+        ContentType.objects.clear_cache()
+        with self.assertNumQueries(0):
+            manager = models.TestModelOne.audit_log
+            instance_manager = self.tm1.audit_log
+        self.assertIs(manager, models.TestModelOne.audit_log)
+        self.assertIs(instance_manager, self.tm1.audit_log)
+
     def test_creates_audit_log_on_create(self):
         audit_log = self.tm2.audit_log.latest()
         self.assertEqual(audit_log.action, 'CREATE')
@@ -96,3 +117,547 @@ class AuditLogTest(AuditBaseTestCase):
         audit_change2 = models.TestModelTwo.audit_log.get(action='DELETE')
         self.assertEqual(audit_change1.model_pk, tm1_pk)
         self.assertEqual(audit_change2.model_pk, tm2_pk)
+
+
+class AuditLogSnapshotTest(AuditBaseTestCase):
+    """Audit Logging with snapshot_on_load Tests"""
+
+    def setUp(self):
+        super(AuditLogSnapshotTest, self).setUp()
+        # warm the content type cache so it doesn't show up in the query counts
+        ContentType.objects.get_for_model(models.SnapshotModel)
+        self.pk = models.SnapshotModel.objects.create(field1='a', field2='b').pk
+
+    def test_update_uses_snapshot(self):
+        instance = models.SnapshotModel.objects.get(pk=self.pk)
+        instance.field1 = 'c'
+        # the update and the change insert, no select of the current row
+        with self.assertNumQueries(2):
+            instance.save()
+        change = instance.audit_log.get(action='UPDATE')
+        self.assertDictEqual(change.changes, {'field1': 'c'})
+        self.assertDictEqual(change.pre_change_state, {'id': self.pk, 'field1': 'a', 'field2': 'b'})
+
+    def test_snapshot_refreshed_after_save(self):
+        instance = models.SnapshotModel.objects.get(pk=self.pk)
+        instance.field1 = 'c'
+        instance.save()
+        instance.field2 = 'd'
+        with self.assertNumQueries(2):
+            instance.save()
+        change = instance.audit_log.filter(action='UPDATE').order_by('-id')[0]
+        self.assertDictEqual(change.changes, {'field2': 'd'})
+        self.assertEqual(change.pre_change_state['field1'], 'c')
+
+    def test_falls_back_to_select_without_snapshot(self):
+        instance = models.SnapshotModel(pk=self.pk, field1='c', field2='b')
+        with self.assertNumQueries(3):
+            instance.save()
+        change = instance.audit_log.get(action='UPDATE')
+        self.assertDictEqual(change.changes, {'field1': 'c'})
+        self.assertEqual(change.pre_change_state['field1'], 'a')
+
+    def test_delete_uses_snapshot(self):
+        instance = models.SnapshotModel.objects.get(pk=self.pk)
+        instance.delete()
+        change = models.SnapshotModel.audit_log.get(action='DELETE')
+        self.assertDictEqual(change.pre_change_state, {'id': self.pk, 'field1': 'a', 'field2': 'b'})
+
+
+class AuditQuerySetTest(AuditBaseTestCase):
+    """Audit Logging for queryset update, bulk_create and delete Tests"""
+
+    def setUp(self):
+        super(AuditQuerySetTest, self).setUp()
+        ContentType.objects.get_for_model(models.BulkModel)
+        self.instances = models.BulkModel.objects.bulk_create([
+            models.BulkModel(pk=pk, field1='x', field2=pk) for pk in (1, 2, 3)
+        ])
+
+    def test_bulk_create(self):
+        changes = models.BulkModel.audit_log.filter(action='CREATE').order_by('model_pk')
+        self.assertEqual([1, 2, 3], [change.model_pk for change in changes])
+        self.assertDictEqual({'id': 1, 'field1': 'x', 'field2': 1}, changes[0].changes)
+
+    def test_update(self):
+        # select of the rows, the update, reading back the updated values and the change inserts
+        with self.assertNumQueries(4):
+            rows = models.BulkModel.objects.filter(pk__in=[1, 2]).update(field1='y')
+        self.assertEqual(2, rows)
+        changes = models.BulkModel.audit_log.filter(action='UPDATE').order_by('model_pk')
+        self.assertEqual([1, 2], [change.model_pk for change in changes])
+        self.assertDictEqual({'field1': 'y'}, changes[0].changes)
+        self.assertDictEqual({'id': 1, 'field1': 'x', 'field2': 1}, changes[0].pre_change_state)
+
+    def test_update_with_expression(self):
+        models.BulkModel.objects.filter(field2__gte=2).update(field2=F('field2') + 10)
+        changes = models.BulkModel.audit_log.filter(action='UPDATE').order_by('model_pk')
+        self.assertEqual([{'field2': 12}, {'field2': 13}], [change.changes for change in changes])
+
+    def test_update_without_changes_not_logged(self):
+        models.BulkModel.objects.filter(pk=1).update(field1='x')
+        self.assertFalse(models.BulkModel.audit_log.filter(action='UPDATE').exists())
+
+    def test_delete(self):
+        # the collector's select, the delete and the change inserts
+        with self.assertNumQueries(3):
+            models.BulkModel.objects.filter(pk__in=[2, 3]).delete()
+        changes = models.BulkModel.audit_log.filter(action='DELETE').order_by('model_pk')
+        self.assertEqual([2, 3], [change.model_pk for change in changes])
+        self.assertDictEqual({'id': 2, 'field1': 'x', 'field2': 2}, changes[0].pre_change_state)
+
+
+class ModelChangeQuerySetTest(AuditBaseTestCase):
+    """ModelChange history lookup Tests"""
+
+    def setUp(self):
+        super(ModelChangeQuerySetTest, self).setUp()
+        self.user = User.objects.create(username='test_user')
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+        self.other = models.TestModelOne.objects.create(field1='b')
+        now = timezone.now()
+        self.changes = [
+            ModelChange.objects.create(model=self.tm1, action='UPDATE', user=self.user,
+                                       timestamp=now + timedelta(days=days))
+            for days in (1, 2, 3)
+        ]
+
+    def test_history_for(self):
+        history = list(ModelChange.objects.history_for(self.tm1))
+        self.assertEqual(4, len(history))
+        self.assertEqual(self.changes[::-1], history[:3])
+        self.assertEqual('CREATE', history[3].action)
+
+    def test_latest_for(self):
+        self.assertEqual(self.changes[2], ModelChange.objects.latest_for(self.tm1))
+        self.assertIsNone(ModelChange.objects.latest_for(models.TestModelOne(pk=0)))
+
+    def test_changes_between(self):
+        changes = ModelChange.objects.changes_between(
+            self.changes[0].timestamp, self.changes[2].timestamp, user=self.user)
+        self.assertEqual([self.changes[1], self.changes[0]], list(changes))
+
+
+class FieldChangeTest(AuditBaseTestCase):
+    """Changed field index Tests"""
+
+    def setUp(self):
+        super(FieldChangeTest, self).setUp()
+        audit_settings.alter_settings(INDEX_CHANGED_FIELDS=True)
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(FieldChangeTest, self).tearDown()
+
+    def test_update_indexes_changed_fields(self):
+        self.tm1.field1 = 'b'
+        self.tm1.save()
+        change = self.tm1.audit_log.get(action='UPDATE')
+        field_change = FieldChange.objects.get()
+        self.assertEqual(change, field_change.change)
+        self.assertEqual('field1', field_change.field_name)
+        self.assertEqual(change.timestamp, field_change.timestamp)
+        self.assertEqual(change.model_type_id, field_change.model_type_id)
+
+    def test_bulk_update_indexes_changed_fields(self):
+        models.BulkModel.objects.bulk_create([models.BulkModel(pk=pk, field1='x') for pk in (1, 2)])
+        models.BulkModel.objects.update(field1='y', field2=5)
+        changes = models.BulkModel.audit_log.filter(action='UPDATE')
+        self.assertEqual(2, changes.count())
+        for change in changes:
+            self.assertEqual({'field1', 'field2'}, set(change.field_changes.values_list('field_name', flat=True)))
+
+    def test_not_indexed_when_disabled(self):
+        audit_settings.alter_settings(INDEX_CHANGED_FIELDS=False)
+        self.tm1.field1 = 'b'
+        self.tm1.save()
+        self.assertFalse(FieldChange.objects.exists())
+
+    def test_field_changed(self):
+        self.tm1.field1 = 'b'
+        self.tm1.save()
+        models.BulkModel.objects.bulk_create([models.BulkModel(pk=1, field1='x')])
+        models.BulkModel.objects.update(field1='y')
+        update = self.tm1.audit_log.get(action='UPDATE')
+
+        self.assertEqual(2, ModelChange.objects.field_changed('field1').count())
+        self.assertEqual([update], list(ModelChange.objects.field_changed('field1', model=models.TestModelOne)))
+        self.assertFalse(ModelChange.objects.field_changed('field2').exists())
+        self.assertFalse(ModelChange.objects.field_changed('field1', since=timezone.now()).exists())
+        self.assertFalse(ModelChange.objects.field_changed('field1', until=update.timestamp).exists())
+
+
+class CompactStorageTest(AuditBaseTestCase):
+    """Compact change storage and state reconstruction Tests"""
+
+    def setUp(self):
+        super(CompactStorageTest, self).setUp()
+        audit_settings.alter_settings(COMPACT_STORAGE=True, CHECKPOINT_INTERVAL=None)
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+        self.tm1.field1 = 'b'
+        self.tm1.save()
+        self.tm1.field1 = 'c'
+        self.tm1.save()
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(CompactStorageTest, self).tearDown()
+
+    def get_updates(self):
+        return list(self.tm1.audit_log.filter(action='UPDATE').order_by('timestamp', 'pk'))
+
+    def test_stores_only_changed_fields(self):
+        first, second = self.get_updates()
+        self.assertTrue(first.compact)
+        self.assertDictEqual({'field1': 'a'}, first.pre_change_state)
+        self.assertDictEqual({'field1': 'b'}, first.changes)
+        self.assertDictEqual({'field1': 'b'}, second.pre_change_state)
+
+    def test_checkpoint(self):
+        audit_settings.alter_settings(CHECKPOINT_INTERVAL=1)
+        self.tm1.field1 = 'd'
+        self.tm1.save()
+        checkpoint = self.get_updates()[-1]
+        self.assertFalse(checkpoint.compact)
+        self.assertDictEqual(dict(model_to_dict(self.tm1), field1='c'), checkpoint.pre_change_state)
+
+    def test_bulk_update(self):
+        models.BulkModel.objects.bulk_create([models.BulkModel(pk=1, field1='x')])
+        models.BulkModel.objects.update(field2=3)
+        change = models.BulkModel.audit_log.get(action='UPDATE')
+        self.assertTrue(change.compact)
+        self.assertDictEqual({'field2': 0}, change.pre_change_state)
+
+    def test_reconstruct_state(self):
+        first, second = self.get_updates()
+        expected = model_to_dict(self.tm1)
+        self.assertDictEqual(expected, second.post_change_state)
+        self.assertDictEqual(dict(expected, field1='b'), first.post_change_state)
+
+    def test_reconstruct_from_checkpoint(self):
+        audit_settings.alter_settings(CHECKPOINT_INTERVAL=1)
+        self.tm1.field1 = 'd'
+        self.tm1.save()
+        audit_settings.alter_settings(CHECKPOINT_INTERVAL=None)
+        self.tm1.field1 = 'e'
+        self.tm1.save()
+        last = self.get_updates()[-1]
+        # finding the checkpoint and reading the changes from it on
+        with self.assertNumQueries(2):
+            state = last.reconstruct_state()
+        self.assertDictEqual(model_to_dict(self.tm1), state)
+
+    def test_state_at(self):
+        first, second = self.get_updates()
+        self.assertEqual('b', ModelChange.objects.state_at(self.tm1, first.timestamp)['field1'])
+        self.assertEqual('c', ModelChange.objects.state_at(self.tm1, timezone.now())['field1'])
+        create = self.tm1.audit_log.get(action='CREATE')
+        self.assertIsNone(ModelChange.objects.state_at(self.tm1, create.timestamp - timedelta(seconds=1)))
+        pk = self.tm1.pk
+        self.tm1.delete()
+        self.assertIsNone(ModelChange.objects.state_at(models.TestModelOne(pk=pk), timezone.now()))
+
+
+class AsOfTest(AuditBaseTestCase):
+    """Point in time reconstruction Tests"""
+
+    def setUp(self):
+        super(AsOfTest, self).setUp()
+        self.start = timezone.now()
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+        self.tm2 = models.TestModelOne.objects.create(field1='x')
+        self.middle = timezone.now()
+        self.tm1.field1 = 'b'
+        self.tm1.save()
+        self.tm2_pk = self.tm2.pk
+        self.tm2.delete()
+        self.end = timezone.now()
+
+    def states(self, manager, timestamp, **kwargs):
+        return [(pk, state['field1']) for pk, state in manager.as_of(timestamp, **kwargs)]
+
+    def test_as_of(self):
+        self.assertEqual([], self.states(models.TestModelOne.audit_log, self.start))
+        self.assertEqual([(self.tm1.pk, 'a'), (self.tm2_pk, 'x')],
+                         self.states(models.TestModelOne.audit_log, self.middle))
+        self.assertEqual([(self.tm1.pk, 'b')], self.states(models.TestModelOne.audit_log, self.end))
+
+    def test_as_of_pks(self):
+        self.assertEqual([(self.tm2_pk, 'x')],
+                         self.states(models.TestModelOne.audit_log, self.middle, pks=[self.tm2_pk]))
+
+    def test_as_of_instance(self):
+        self.assertEqual([(self.tm1.pk, 'a')], self.states(self.tm1.audit_log, self.middle))
+        self.assertEqual(model_to_dict(self.tm1), dict(self.tm1.audit_log.as_of(self.end))[self.tm1.pk])
+
+    def test_as_of_compact(self):
+        audit_settings.alter_settings(COMPACT_STORAGE=True, CHECKPOINT_INTERVAL=None)
+        self.addCleanup(audit_settings.reset)
+        self.tm1.field2 = 'c'
+        self.tm1.save()
+        self.assertEqual(model_to_dict(self.tm1), dict(self.tm1.audit_log.as_of(timezone.now()))[self.tm1.pk])
+
+    def test_cache(self):
+        cache = StateCache()
+        uncached = list(models.TestModelOne.audit_log.as_of(self.middle))
+        self.assertEqual(uncached, list(models.TestModelOne.audit_log.as_of(self.middle, cache=cache)))
+
+        # a change from before the cached time isn't replayed again
+        ModelChange.objects.filter(model_pk=self.tm1.pk, action='CREATE').update(changes={'field1': 'z'})
+        self.assertEqual([(self.tm1.pk, 'b')], self.states(models.TestModelOne.audit_log, self.end, cache=cache))
+        self.assertEqual([(self.tm1.pk, 'b')],
+                         self.states(models.TestModelOne.audit_log, self.end, cache=cache, pks=[self.tm1.pk]))
+        self.assertEqual([(self.tm1.pk, 'z')], self.states(models.TestModelOne.audit_log, self.middle,
+                                                           pks=[self.tm1.pk]))
+
+    def test_cache_size(self):
+        cache = StateCache(size=1)
+        list(models.TestModelOne.audit_log.as_of(self.middle, cache=cache))
+        list(models.TestModelOne.audit_log.as_of(self.end, cache=cache, pks=[self.tm1.pk]))
+        self.assertEqual((None, {}), cache.get(self.tm1.audit_log.model_type_id, self.end))
+
+
+class FieldExtractorTest(AuditBaseTestCase):
+    """FieldExtractor Tests"""
+
+    def test_state_matches_model_to_dict(self):
+        tm2 = models.TestModelTwo.objects.create(tm1=models.TestModelOne.objects.create(field1='a'), field1='b')
+        self.assertDictEqual(model_to_dict(tm2), FieldExtractor(models.TestModelTwo).state(tm2))
+        self.assertDictEqual(model_to_dict(tm2, exclude=['tm1']),
+                             FieldExtractor(models.TestModelTwo, exclude=['tm1']).state(tm2))
+
+    def test_diff(self):
+        extractor = FieldExtractor(models.SnapshotModel)
+        instance = models.SnapshotModel(pk=1, field1='a', field2='b')
+        old_values = extractor.values(instance)
+        self.assertEqual({}, extractor.diff(old_values, extractor.values(instance)))
+        instance.field2 = 'c'
+        self.assertEqual({'field2': 'c'}, extractor.diff(old_values, extractor.values(instance)))
+
+    def test_wide_model(self):
+        instance = models.WideModel.objects.create()
+        instance.field42 = 1
+        # no select, the snapshot is used
+        with self.assertNumQueries(2):
+            instance.save()
+        change = instance.audit_log.get(action='UPDATE')
+        self.assertDictEqual({'field42': 1}, change.changes)
+        self.assertEqual(121, len(change.pre_change_state))
+
+
+class TrackedFieldsTest(AuditBaseTestCase):
+    """fields, exclude and ignore_only_changes_to Tests"""
+
+    def setUp(self):
+        super(TrackedFieldsTest, self).setUp()
+        self.instance = models.ConfiguredModel.objects.create(field1='a', secret='s')
+
+    def test_exclude(self):
+        create = self.instance.audit_log.get(action='CREATE')
+        self.assertNotIn('secret', create.changes)
+        self.instance.secret = 't'
+        self.instance.save()
+        self.assertFalse(self.instance.audit_log.filter(action='UPDATE').exists())
+
+    def test_fields(self):
+        instance = models.FieldsModel.objects.create(field1='a', field2='b')
+        self.assertDictEqual({'field1': 'a'}, instance.audit_log.get(action='CREATE').changes)
+        instance.field2 = 'c'
+        instance.save()
+        self.assertFalse(instance.audit_log.filter(action='UPDATE').exists())
+
+    def test_ignore_only_changes_to(self):
+        self.instance.last_seen = 1
+        self.instance.save()
+        self.assertFalse(self.instance.audit_log.filter(action='UPDATE').exists())
+        self.instance.last_seen = 2
+        self.instance.field1 = 'b'
+        self.instance.save()
+        change = self.instance.audit_log.get(action='UPDATE')
+        self.assertDictEqual({'field1': 'b', 'last_seen': 2}, change.changes)
+
+    def test_ignored_update_fields_skip_everything(self):
+        self.instance.last_seen = 1
+        # only the update itself, no select of the current row and no change written
+        with self.assertNumQueries(1):
+            self.instance.save(update_fields=['last_seen'])
+        with self.assertNumQueries(1):
+            self.instance.save(update_fields=['secret'])
+        self.assertFalse(self.instance.audit_log.filter(action='UPDATE').exists())
+
+    def test_queryset_update(self):
+        with self.assertNumQueries(1):
+            models.ConfiguredModel.objects.update(last_seen=5)
+        models.ConfiguredModel.objects.update(last_seen=6, field1='b')
+        change = self.instance.audit_log.get(action='UPDATE')
+        self.assertDictEqual({'field1': 'b', 'last_seen': 6}, change.changes)
+
+
+class UpdateFieldsTest(AuditBaseTestCase):
+    """update_fields narrowing Tests"""
+
+    def test_only_listed_fields_read_and_compared(self):
+        instance = models.WideModel.objects.create()
+        # without the snapshot the current values are selected
+        getattr(instance, audit_settings.AUDIT_META_NAME).snapshot = None
+        instance.field1 = 1
+        with CaptureQueriesContext(connection) as queries:
+            instance.save(update_fields=['field1'])
+        self.assertEqual(3, len(queries))
+        self.assertNotIn('field2', queries[0]['sql'])
+        change = instance.audit_log.get(action='UPDATE')
+        self.assertDictEqual({'field1': 1}, change.changes)
+        self.assertDictEqual({'field1': 0}, change.pre_change_state)
+        self.assertTrue(change.compact)
+        self.assertEqual(dict(model_to_dict(models.WideModel.objects.get()), id=instance.pk),
+                         change.post_change_state)
+
+    def test_unsaved_fields_not_logged(self):
+        instance = models.SnapshotModel.objects.create(field1='a', field2='b')
+        instance.field1 = 'c'
+        instance.field2 = 'd'
+        instance.save(update_fields=['field2'])
+        change = instance.audit_log.get(action='UPDATE')
+        self.assertDictEqual({'field2': 'd'}, change.changes)
+        self.assertFalse(change.compact)
+
+    def test_select_without_snapshot(self):
+        instance = models.TestModelTwo.objects.create(
+            tm1=models.TestModelOne.objects.create(field1='a'), field1='b')
+        instance.field1 = 'c'
+        instance.save(update_fields=['field1'])
+        change = instance.audit_log.get(action='UPDATE')
+        self.assertDictEqual({'field1': 'b'}, change.pre_change_state)
+        self.assertDictEqual(model_to_dict(instance), change.post_change_state)
+
+
+class ManyToManyTest(AuditBaseTestCase):
+    """many to many change Tests"""
+
+    def setUp(self):
+        super(ManyToManyTest, self).setUp()
+        self.tags = [models.Tag.objects.create(name=name) for name in ('a', 'b', 'c')]
+        self.instance = models.TaggedModel.objects.create(field1='a')
+        self.tag_pks = sorted(tag.pk for tag in self.tags)
+
+    def link_changes(self):
+        return [(change.action, change.changes) for change in
+                self.instance.audit_log.filter(action__in=['LINK', 'UNLINK']).order_by('pk')]
+
+    def test_connected_to_tracked_relations(self):
+        self.assertTrue(m2m_changed.has_listeners(models.TaggedModel.tags.through))
+        self.assertFalse(m2m_changed.has_listeners(User.groups.through))
+
+    def test_save_doesnt_read_relations(self):
+        self.assertDictEqual({'id': self.instance.pk, 'field1': 'a'}, self.instance.audit_log.get().changes)
+        self.instance.tags.add(*self.tags)
+        self.instance.field1 = 'b'
+        with CaptureQueriesContext(connection) as queries:
+            self.instance.save()
+        self.assertFalse([query for query in queries if '"testapp_tag' in query['sql'] and 'tags' in query['sql']])
+        self.assertDictEqual({'field1': 'b'}, self.instance.audit_log.get(action='UPDATE').changes)
+
+    def test_add_and_remove(self):
+        self.instance.tags.add(*self.tags)
+        # already related, nothing is added
+        self.instance.tags.add(self.tags[0])
+        self.instance.tags.remove(self.tags[1])
+        self.assertEqual([
+            ('LINK', {'tags': self.tag_pks}),
+            ('UNLINK', {'tags': [self.tags[1].pk]}),
+        ], self.link_changes())
+
+    def test_clear(self):
+        self.instance.tags.add(*self.tags[:2])
+        self.instance.tags.clear()
+        self.assertEqual(('UNLINK', {'tags': self.tag_pks[:2]}), self.link_changes()[-1])
+
+    def test_reverse(self):
+        other = models.TaggedModel.objects.create(field1='b')
+        self.tags[0].tagged.add(self.instance, other)
+        self.assertEqual([('LINK', {'tags': [self.tags[0].pk]})], self.link_changes())
+        self.tags[0].tagged.clear()
+        self.assertEqual(('UNLINK', {'tags': [self.tags[0].pk]}), self.link_changes()[-1])
+        self.assertEqual(2, other.audit_log.filter(action__in=['LINK', 'UNLINK']).count())
+
+    def test_history_skips_links(self):
+        self.instance.tags.add(*self.tags)
+        link = self.instance.audit_log.get(action='LINK')
+        self.assertTrue(link.compact)
+        self.assertDictEqual({'id': self.instance.pk, 'field1': 'a'}, link.post_change_state)
+        self.assertDictEqual({'id': self.instance.pk, 'field1': 'a'},
+                             ModelChange.objects.state_at(self.instance, timezone.now()))
+
+
+class HashChainTest(AuditBaseTestCase):
+    """hash chain Tests"""
+
+    def setUp(self):
+        super(HashChainTest, self).setUp()
+        audit_settings.alter_settings(HASH_CHAIN=True)
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+        for value in 'bcd':
+            self.tm1.field1 = value
+            self.tm1.save()
+        models.TestModelTwo.objects.create(tm1=self.tm1, field1='a')
+        self.model_type_id = ContentType.objects.get_for_model(models.TestModelOne).pk
+        self.changes = list(self.tm1.audit_log.order_by('pk'))
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(HashChainTest, self).tearDown()
+
+    def verify(self):
+        return verify_chain(self.model_type_id, batch_size=2)
+
+    def test_chained(self):
+        self.assertTrue(all(change.chain_hash for change in self.changes))
+        self.assertEqual(self.changes[-1].chain_hash, HashChainHead.objects.get(model_type_id=self.model_type_id).hash)
+        result = self.verify()
+        self.assertEqual((4, [], True), (result.checked, result.broken, result.head_found))
+
+    def test_changed_row(self):
+        ModelChange.objects.filter(pk=self.changes[2].pk).update(changes={'field1': 'x'})
+        self.assertEqual([self.changes[2].pk], self.verify().broken)
+
+    def test_changed_first_row(self):
+        ModelChange.objects.filter(pk=self.changes[0].pk).update(changes={'field1': 'x'})
+        self.assertEqual([self.changes[0].pk], self.verify().broken)
+
+    def test_inserted_row(self):
+        forged = ModelChange.objects.create(model=self.tm1, action='UPDATE', changes={'field1': 'x'})
+        result = self.verify()
+        self.assertEqual(([forged.pk], True), (result.broken, result.head_found))
+
+    def test_removed_rows(self):
+        ModelChange.objects.filter(pk=self.changes[1].pk).delete()
+        self.assertEqual([self.changes[2].pk], self.verify().broken)
+        ModelChange.objects.filter(pk=self.changes[-1].pk).delete()
+        self.assertFalse(self.verify().head_found)
+
+    def test_oldest_rows_removed(self):
+        oldest = ModelChange.objects.filter(pk__in=[change.pk for change in self.changes[:2]])
+        oldest.delete()
+        self.assertEqual([self.changes[2].pk], self.verify().broken)
+
+    def test_chain_start_moved(self):
+        oldest = ModelChange.objects.filter(pk__in=[change.pk for change in self.changes[:2]])
+        move_chain_starts(oldest)
+        oldest.delete()
+        result = self.verify()
+        self.assertEqual((2, [], True), (result.checked, result.broken, result.head_found))
+
+    def test_starts_after_older_changes(self):
+        audit_settings.alter_settings(HASH_CHAIN=False)
+        models.BulkModel.objects.create(field1='a')
+        audit_settings.alter_settings(HASH_CHAIN=True)
+        models.BulkModel.objects.create(field1='b')
+        result = verify_chain(ContentType.objects.get_for_model(models.BulkModel).pk)
+        self.assertEqual((1, [], True), (result.checked, result.broken, result.head_found))
+
+    def test_bulk_changes(self):
+        models.BulkModel.objects.bulk_create([models.BulkModel(pk=pk, field1='a') for pk in range(1, 4)])
+        models.BulkModel.objects.update(field2=1)
+        result = verify_chain(ContentType.objects.get_for_model(models.BulkModel).pk)
+        self.assertEqual((6, [], True), (result.checked, result.broken, result.head_found))
@@ -0,0 +1,81 @@
+from unittest import skipUnless
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from auditlog.default_settings import settings as audit_settings
+from auditlog.models import ModelChange
+from auditlog.routers import AuditRouter
+from .base import AuditBaseTestCase, AuditBaseTransactionTestCase
+from testapp import models
+
+
+class AuditDatabaseTest(AuditBaseTestCase):
+    """dedicated audit database Tests"""
+    multi_db = True
+
+    def setUp(self):
+        if 'audit' not in settings.DATABASES:
+            self.skipTest('needs an audit database')
+        super(AuditDatabaseTest, self).setUp()
+        audit_settings.alter_settings(DATABASE='audit')
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(AuditDatabaseTest, self).tearDown()
+
+    def test_changes_read_from_audit_database(self):
+        user = User.objects.create(username='auditor')
+        tm1 = models.TestModelOne.objects.create(field1='a')
+        ModelChange.objects.create(model=tm1, action='UPDATE', user=user, changes={'field1': 'b'})
+        self.assertEqual(1, ModelChange.objects.using('audit').filter(action='UPDATE').count())
+        self.assertFalse(ModelChange.objects.using('default').exists())
+        self.assertEqual(user, tm1.audit_log.get(action='UPDATE').user)
+
+    def test_allow_migrate(self):
+        router = AuditRouter()
+        label = audit_settings.APP_LABEL
+        self.assertTrue(router.allow_migrate('audit', label, 'modelchange'))
+        self.assertFalse(router.allow_migrate('default', label, 'modelchange'))
+        self.assertIsNone(router.allow_migrate('audit', 'contenttypes', 'contenttype'))
+        self.assertIsNone(router.allow_migrate('audit', 'testapp', 'testmodelone'))
+        self.assertIsNone(router.allow_migrate('default', 'testapp', 'testmodelone'))
+
+        audit_settings.alter_settings(DATABASE=None)
+        self.assertIsNone(router.allow_migrate('default', label, 'modelchange'))
+        self.assertIsNone(router.db_for_write(ModelChange))
+
+
+class AuditDatabaseTransactionTest(AuditBaseTransactionTestCase):
+    """dedicated audit database transaction Tests"""
+    multi_db = True
+
+    def setUp(self):
+        if 'audit' not in settings.DATABASES:
+            self.skipTest('needs an audit database')
+        super(AuditDatabaseTransactionTest, self).setUp()
+        audit_settings.alter_settings(DATABASE='audit')
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(AuditDatabaseTransactionTest, self).tearDown()
+
+    @skipUnless(hasattr(transaction, 'on_commit'), 'requires transaction.on_commit')
+    def test_written_when_the_transaction_commits(self):
+        with transaction.atomic():
+            tm1 = models.TestModelOne.objects.create(field1='a')
+            tm1.field1 = 'b'
+            tm1.save()
+            self.assertFalse(ModelChange.objects.exists())
+        self.assertEqual(['CREATE', 'UPDATE'], list(tm1.audit_log.order_by('pk').values_list('action', flat=True)))
+
+    @skipUnless(hasattr(transaction, 'on_commit'), 'requires transaction.on_commit')
+    def test_discarded_on_rollback(self):
+        try:
+            with transaction.atomic():
+                models.TestModelOne.objects.create(field1='a')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(models.TestModelOne.objects.exists())
+        self.assertFalse(ModelChange.objects.exists())
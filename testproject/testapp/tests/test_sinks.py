@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.db import transaction
+
+from auditlog.default_settings import settings as audit_settings
+from auditlog.models import ModelChange
+from auditlog.sinks import FileSink, get_sinks
+from auditlog.writer import async_writer
+from .base import AuditBaseTestCase, AuditBaseTransactionTestCase
+from testapp import models
+
+
+MEMORY_SINK = {'BACKEND': 'auditlog.sinks.MemorySink'}
+
+
+class SinkTest(AuditBaseTestCase):
+    """audit sink Tests"""
+
+    def tearDown(self):
+        audit_settings.reset()
+        super(SinkTest, self).tearDown()
+
+    def test_memory_sink_only(self):
+        audit_settings.alter_settings(SINKS=[MEMORY_SINK])
+        tm1 = models.TestModelOne.objects.create(field1='a')
+        self.assertEqual(0, ModelChange.objects.count())
+        sink = get_sinks()[0]
+        self.assertEqual([('CREATE', tm1.pk)], [(change.action, change.model_pk) for change in sink.changes])
+
+    def test_every_sink_gets_the_changes(self):
+        audit_settings.alter_settings(SINKS=[
+            {'BACKEND': 'auditlog.sinks.DatabaseSink', 'OPTIONS': {'using': 'default'}}, MEMORY_SINK])
+        models.TestModelOne.objects.create(field1='a')
+        self.assertEqual(1, ModelChange.objects.count())
+        self.assertEqual(1, len(get_sinks()[1].changes))
+
+    def test_sinks_made_once(self):
+        audit_settings.alter_settings(SINKS=[MEMORY_SINK])
+        self.assertIs(get_sinks()[0], get_sinks()[0])
+
+
+class FileSinkTest(AuditBaseTransactionTestCase):
+    """FileSink Tests"""
+
+    def setUp(self):
+        super(FileSinkTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'audit.jsonl')
+
+    def tearDown(self):
+        audit_settings.reset()
+        shutil.rmtree(self.directory)
+        super(FileSinkTest, self).tearDown()
+
+    def read_lines(self, path):
+        with open(path, 'rb') as log:
+            return [json.loads(line.decode('utf-8')) for line in log]
+
+    def test_appends_json_lines(self):
+        audit_settings.alter_settings(SINKS=[
+            {'BACKEND': 'auditlog.sinks.FileSink', 'OPTIONS': {'path': self.path, 'fsync_interval': 0}}])
+        tm1 = models.TestModelOne.objects.create(field1='a')
+        tm1.field1 = 'b'
+        tm1.save()
+        get_sinks()[0].close()
+        lines = self.read_lines(self.path)
+        self.assertEqual(['CREATE', 'UPDATE'], [line['action'] for line in lines])
+        self.assertEqual({'field1': 'b'}, lines[1]['changes'])
+        self.assertEqual(tm1.pk, lines[1]['model_pk'])
+
+    def saved_changes(self, write_mode):
+        audit_settings.alter_settings(WRITE_MODE=write_mode, SINKS=[
+            {'BACKEND': 'auditlog.sinks.DatabaseSink'},
+            {'BACKEND': 'auditlog.sinks.FileSink', 'OPTIONS': {'path': self.path}},
+        ])
+        with transaction.atomic():
+            tm1 = models.TestModelOne.objects.create(field1='a')
+            tm1.field1 = 'b'
+            tm1.save()
+        self.assertEqual([], get_sinks(first=True)[1:])
+        async_writer.stop()
+        get_sinks()[1].close()
+        pks = list(ModelChange.objects.order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(2, len(pks))
+        self.assertEqual(pks, [line['id'] for line in self.read_lines(self.path)])
+
+    def test_written_once_saved_buffered(self):
+        self.saved_changes('buffered')
+
+    def test_written_once_saved_async(self):
+        self.saved_changes('async')
+
+    def test_rotates(self):
+        sink = FileSink(self.path, max_bytes=1, backup_count=2)
+        for value in range(4):
+            sink.write([ModelChange(model_type_id=1, model_pk=value, action='CREATE')])
+        sink.close()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual([3], [line['model_pk'] for line in self.read_lines(self.path + '.1')])
+        self.assertEqual([2], [line['model_pk'] for line in self.read_lines(self.path + '.2')])
+        self.assertFalse(os.path.exists(self.path + '.3'))
@@ -0,0 +1,76 @@
+import threading
+
+from auditlog.context import is_audit_disabled
+from auditlog.default_settings import settings as audit_settings
+from auditlog.utils import disable_audit
+from .base import AuditBaseTestCase
+from testapp import models
+
+
+class DisableAuditTest(AuditBaseTestCase):
+    """disable_audit Tests"""
+
+    def setUp(self):
+        super(DisableAuditTest, self).setUp()
+        self.tm1 = models.TestModelOne.objects.create(field1='a')
+
+    def update(self, instance, value):
+        instance.field1 = value
+        instance.save()
+
+    def test_context_manager(self):
+        with disable_audit:
+            self.update(self.tm1, 'b')
+        self.assertFalse(self.tm1.audit_log.filter(action='UPDATE').exists())
+        self.update(self.tm1, 'c')
+        self.assertTrue(self.tm1.audit_log.filter(action='UPDATE').exists())
+
+    def test_decorator(self):
+        disable_audit(self.update)(self.tm1, 'b')
+        disable_audit(actions=['DELETE'])(self.update)(self.tm1, 'c')
+        self.assertEqual(1, self.tm1.audit_log.filter(action='UPDATE').count())
+
+    def test_does_not_change_settings(self):
+        audit_settings.alter_settings(BUFFER_SIZE=3)
+        self.addCleanup(audit_settings.reset)
+        with disable_audit:
+            self.assertTrue(audit_settings.CHANGE_LOGGING)
+        self.assertEqual(3, audit_settings.BUFFER_SIZE)
+
+    def test_nested(self):
+        with disable_audit:
+            with disable_audit:
+                self.update(self.tm1, 'b')
+            self.update(self.tm1, 'c')
+        self.assertFalse(self.tm1.audit_log.filter(action='UPDATE').exists())
+
+    def test_models(self):
+        tm2 = models.TestModelTwo.objects.create(tm1=self.tm1, field1='x')
+        with disable_audit(models=[models.TestModelOne]):
+            self.update(self.tm1, 'b')
+            self.update(tm2, 'y')
+        self.assertFalse(self.tm1.audit_log.filter(action='UPDATE').exists())
+        self.assertTrue(tm2.audit_log.filter(action='UPDATE').exists())
+
+    def test_actions(self):
+        with disable_audit(actions=['UPDATE']):
+            self.update(self.tm1, 'b')
+            tm1 = models.TestModelOne.objects.create(field1='z')
+        self.assertFalse(self.tm1.audit_log.filter(action='UPDATE').exists())
+        self.assertTrue(tm1.audit_log.filter(action='CREATE').exists())
+
+    def test_queryset_operations(self):
+        models.BulkModel.objects.bulk_create([models.BulkModel(pk=1, field1='x')])
+        with disable_audit(actions=['UPDATE', 'DELETE']):
+            models.BulkModel.objects.update(field1='y')
+            models.BulkModel.objects.all().delete()
+        self.assertEqual(['CREATE'], list(models.BulkModel.audit_log.values_list('action', flat=True)))
+
+    def test_other_threads_still_audited(self):
+        seen = []
+        with disable_audit:
+            thread = threading.Thread(target=lambda: seen.append(is_audit_disabled(models.TestModelOne, 'UPDATE')))
+            thread.start()
+            thread.join()
+            self.assertTrue(is_audit_disabled(models.TestModelOne, 'UPDATE'))
+        self.assertEqual([False], seen)
@@ -3,6 +3,8 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
 
+from auditlog.context import request_attribution
+from auditlog.signals import audit_presave
 from .base import AuditBaseTestCase
 from testapp import models
 
@@ -27,3 +29,16 @@ class ViewAuditTest(AuditBaseTestCase):
 
         self.assertEqual(change.action, 'CREATE')
         self.assertEqual(change.user, self.user)
+
+        self.assertIsNone(request_attribution.get())
+
+    def test_no_signal_receivers(self):
+        receivers = len(audit_presave.receivers)
+        self.client.post(reverse('apitest'), {'field1': 'x'})
+        self.assertEqual(receivers, len(audit_presave.receivers))
+
+    def test_attribution_reset_after_exception(self):
+        with self.assertRaises(RuntimeError):
+            self.client.post(reverse('apitest-failing'), {'field1': 'x'})
+        self.assertEqual(self.user, models.TestModelOne.objects.get().audit_log.latest().user)
+        self.assertIsNone(request_attribution.get())
@@ -0,0 +1,73 @@
+import os
+from unittest import skipUnless
+
+from django.db import transaction
+from django.utils.six.moves import queue
+
+from auditlog.default_settings import settings as audit_settings
+from auditlog.models import ModelChange
+from auditlog.sinks import DatabaseSink
+from auditlog.writer import AsyncWriter, async_writer
+from .base import AuditBaseTransactionTestCase
+from testapp import models
+
+
+class AsyncWriterTest(AuditBaseTransactionTestCase):
+    """Asynchronous Change Writing Tests"""
+
+    def setUp(self):
+        super(AsyncWriterTest, self).setUp()
+        audit_settings.alter_settings(WRITE_MODE='async', ASYNC_FLUSH_INTERVAL=0.01)
+
+    def tearDown(self):
+        async_writer.stop()
+        audit_settings.reset()
+        super(AsyncWriterTest, self).tearDown()
+
+    def test_writes_in_background(self):
+        for value in ('a', 'b', 'c'):
+            models.TestModelOne.objects.create(field1=value)
+        async_writer.flush()
+        self.assertEqual(3, ModelChange.objects.count())
+
+    def test_stop_writes_queued_changes(self):
+        audit_settings.alter_settings(ASYNC_FLUSH_INTERVAL=60, ASYNC_BATCH_SIZE=100)
+        models.TestModelOne.objects.create(field1='a')
+        async_writer.stop()
+        self.assertEqual(1, ModelChange.objects.count())
+
+    def full_writer(self):
+        """ a writer whose queue is full, with no workers taking anything off it """
+        writer = AsyncWriter()
+        writer.pid = os.getpid()
+        writer.threads = [None]
+        writer.queue = queue.Queue(maxsize=1)
+        writer.queue.put(None)
+        return writer
+
+    def test_overflow_drop(self):
+        audit_settings.alter_settings(ASYNC_OVERFLOW='drop')
+        writer = self.full_writer()
+        writer.put([ModelChange(), ModelChange()], DatabaseSink())
+        self.assertEqual(2, writer.dropped)
+
+    def test_overflow_write(self):
+        audit_settings.alter_settings(ASYNC_OVERFLOW='write')
+        tm1 = models.TestModelOne.objects.create(field1='a')
+        async_writer.flush()
+        writer = self.full_writer()
+        writer.put([ModelChange(model=tm1, action='UPDATE')], DatabaseSink())
+        self.assertEqual(2, ModelChange.objects.count())
+
+    @skipUnless(hasattr(transaction, 'on_commit'), 'requires transaction.on_commit')
+    def test_discards_on_rollback(self):
+        try:
+            with transaction.atomic():
+                models.TestModelOne.objects.create(field1='a')
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            models.TestModelOne.objects.create(field1='b')
+        async_writer.flush()
+        self.assertEqual(1, ModelChange.objects.count())
@@ -1,8 +1,11 @@
-from django.conf.urls import patterns, url
+from django.conf.urls import include, patterns, url
+from django.contrib import admin
 from . import views
 
 urlpatterns = patterns(
     '',
     url(r'^$', views.test_view, name='test'),
     url(r'^apitest/$', views.TestAPIView.as_view(), name='apitest'),
+    url(r'^apitest/failing/$', views.FailingAPIView.as_view(), name='apitest-failing'),
+    url(r'^admin/', include(admin.site.urls)),
 )
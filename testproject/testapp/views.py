@@ -27,3 +27,16 @@ class TestAPIView(DRFViewMixin, generics.CreateAPIView):
 
     queryset = models.TestModelOne.objects.all()
     serializer_class = TestModelOneSerializer
+
+
+class FailingAPIView(DRFViewMixin, generics.CreateAPIView):
+    """ saves and then fails with an exception DRF doesn't handle """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    queryset = models.TestModelOne.objects.all()
+    serializer_class = TestModelOneSerializer
+
+    def perform_create(self, serializer):
+        super(FailingAPIView, self).perform_create(serializer)
+        raise RuntimeError('failed after saving')